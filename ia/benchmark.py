@@ -0,0 +1,641 @@
+import argparse
+import asyncio
+import contextlib
+import inspect
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from instrumentation import max_rss_mb
+from numpy_policy import NumpyPolicy
+from replay_buffer import PrioritizedReplayBuffer, ReplayBuffer
+from sim_env import FieldSim
+from tractor_env import VecTractorEnv, endpoints_for_ports
+
+
+def synthetic_transitions(n, seed=0):
+    """Genera n transiciones sintéticas como listas de Python (igual que llegan del JSON)"""
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        state = rng.uniform(-1, 1, 7).tolist()
+        action = rng.uniform(-1, 1, 3).tolist()
+        next_state = rng.uniform(-1, 1, 7).tolist()
+        yield state, action, float(rng.normal()), next_state, bool(rng.random() < 0.05)
+
+
+def fill_memory(agent, n, seed=0):
+    """Llena la memoria del agente con transiciones sintéticas"""
+    for transition in synthetic_transitions(n, seed):
+        agent.remember(*transition)
+
+
+def replay_legacy(agent, memory):
+    """Replay original: un predict por cada next_state no terminal (referencia)"""
+    minibatch = random.sample(memory, agent.batch_size)
+    states = np.array([x[0] for x in minibatch])
+    targets = agent.model.predict(states, verbose=0)
+
+    for i, (state, action, reward, next_state, done) in enumerate(minibatch):
+        target = reward
+        if not done:
+            next_state = np.array(next_state).reshape(1, -1)
+            Q_future = np.max(agent.model.predict(next_state, verbose=0)[0])
+            target = reward + Q_future * agent.gamma
+        targets[i] = np.array([target, target, target])
+
+    agent.model.fit(states, targets, epochs=1, verbose=0)
+
+
+def replay_online(agent):
+    """Replay vectorizado sin red objetivo: bootstrap con la red online y el mismo escalar en las 3 salidas (referencia)"""
+    states, _, rewards, next_states, dones = agent.memory.sample(agent.batch_size)
+    q_next = agent.model.predict_on_batch(next_states)
+    target = rewards + agent.gamma * np.max(q_next, axis=1) * (1.0 - dones)
+    agent.model.train_on_batch(states, np.repeat(target[:, None], 3, axis=1))
+    agent._policy_stale = True
+
+
+def time_calls(fn, iterations, warmup=3):
+    """Devuelve los segundos por llamada de fn()"""
+    for _ in range(warmup):
+        fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def latency_percentiles(fn, iterations, warmup=3):
+    """Mide cada llamada por separado y devuelve (p50, p99) en segundos"""
+    for _ in range(warmup):
+        fn()
+    samples = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - start
+    return float(np.percentile(samples, 50)), float(np.percentile(samples, 99))
+
+
+def bench_replay(iterations=50, seed=0):
+    """Compara el replay original con el replay vectorizado"""
+    from train_tractor import TractorAgent
+
+    random.seed(seed)
+    np.random.seed(seed)
+    agent = TractorAgent()
+    fill_memory(agent, 2000, seed)
+    legacy_memory = deque(synthetic_transitions(2000, seed), maxlen=2000)
+
+    results = {}
+    for name, fn in [("antes (bucle)", lambda: replay_legacy(agent, legacy_memory)),
+                     ("después (batch)", agent.replay)]:
+        per_call = time_calls(fn, iterations)
+        # Un replay cada train_interval pasos: techo de pasos/seg que permite el entrenamiento
+        steps_per_sec = agent.train_interval / per_call
+        results[name] = {"seconds": per_call, "updates_per_sec": 1.0 / per_call, "steps_per_sec": steps_per_sec}
+        print(f"   ├─ {name}: {per_call * 1000:.2f} ms/replay | {1.0 / per_call:.1f} replays/seg "
+              f"| {steps_per_sec:.1f} pasos/seg")
+
+    speedup = results["antes (bucle)"]["seconds"] / results["después (batch)"]["seconds"]
+    print(f"   └─ Aceleración: {speedup:.1f}x")
+    return results
+
+
+def bench_memory(capacity=100_000, batch_size=32, iterations=2000, seed=0):
+    """Compara el muestreo del deque de tuplas con el ReplayBuffer de arrays"""
+    legacy = deque(synthetic_transitions(capacity, seed), maxlen=capacity)
+    buffer = ReplayBuffer(capacity, seed=seed)
+    for transition in legacy:
+        buffer.add(*transition)
+
+    def sample_legacy():
+        minibatch = random.sample(legacy, batch_size)
+        states = np.array([x[0] for x in minibatch])
+        rewards = np.array([x[2] for x in minibatch])
+        next_states = np.array([x[3] for x in minibatch])
+        dones = np.array([x[4] for x in minibatch])
+        return states, rewards, next_states, dones
+
+    legacy_time = time_calls(sample_legacy, iterations)
+    buffer_time = time_calls(lambda: buffer.sample(batch_size), iterations)
+    add_time = time_calls(lambda: buffer.add(*legacy[0]), iterations)
+    print(f"   ├─ deque + random.sample: {legacy_time * 1e6:.1f} µs/lote")
+    print(f"   ├─ ReplayBuffer.sample:   {buffer_time * 1e6:.1f} µs/lote")
+    print(f"   ├─ ReplayBuffer.add:      {add_time * 1e6:.1f} µs/transición")
+    print(f"   └─ Aceleración muestreo: {legacy_time / buffer_time:.1f}x")
+    return {"legacy": legacy_time, "buffer": buffer_time, "add": add_time}
+
+
+def bench_per(sizes=(100_000, 1_000_000), batch_size=32, iterations=2000, seed=0):
+    """Coste de muestreo y de actualización de prioridades del PER frente al uniforme"""
+    rng = np.random.default_rng(seed)
+    results = {}
+    for size in sizes:
+        uniform = ReplayBuffer(size, seed=seed)
+        prioritized = PrioritizedReplayBuffer(size, seed=seed)
+        # Llenado por bloques para no medir la inserción
+        chunk = 100_000
+        for start in range(0, size, chunk):
+            n = min(chunk, size - start)
+            batch = (rng.uniform(-1, 1, (n, 7)), rng.uniform(-1, 1, (n, 3)), rng.normal(size=n),
+                     rng.uniform(-1, 1, (n, 7)), rng.random(n) < 0.05)
+            uniform.add_batch(*batch)
+            prioritized.add_batch(*batch)
+        prioritized.update_priorities(np.arange(size), rng.exponential(size=size))
+
+        uniform_time = time_calls(lambda: uniform.sample(batch_size), iterations)
+        per_time = time_calls(lambda: prioritized.sample(batch_size), iterations)
+        idx = prioritized.sample(batch_size)[5]
+        update_time = time_calls(lambda: prioritized.update_priorities(idx, rng.exponential(size=batch_size)), iterations)
+        add_time = time_calls(lambda: prioritized.add(*prioritized.get(0)), iterations)
+        print(f"   ├─ N={size:,}: uniforme {uniform_time * 1e6:.1f} µs | PER {per_time * 1e6:.1f} µs/lote "
+              f"| prioridades {update_time * 1e6:.1f} µs/lote | add {add_time * 1e6:.1f} µs")
+        results[str(size)] = {"uniform": uniform_time, "per": per_time, "update": update_time, "add": add_time}
+    print(f"   └─ Lote de {batch_size}, {iterations} iteraciones")
+    return results
+
+
+def bench_inference(model_path='tractor_model_final.h5', iterations=500, seed=0):
+    """Latencia por paso de una observación 1x7: Keras frente a NumpyPolicy"""
+    from keras.models import load_model
+
+    model = load_model(model_path)
+    policy = NumpyPolicy.from_model(model)
+    obs = np.random.default_rng(seed).uniform(-1, 1, (1, 7)).astype(np.float32)
+
+    error = float(np.max(np.abs(model.predict(obs, verbose=0) - policy.predict(obs))))
+    results = {}
+    for name, fn in [("model.predict", lambda: model.predict(obs, verbose=0)),
+                     ("model.predict_on_batch", lambda: model.predict_on_batch(obs)),
+                     ("NumpyPolicy.predict", lambda: policy.predict(obs))]:
+        p50, p99 = latency_percentiles(fn, iterations)
+        results[name] = {"p50": p50, "p99": p99}
+        print(f"   ├─ {name}: p50 {p50 * 1e6:.1f} µs | p99 {p99 * 1e6:.1f} µs")
+
+    speedup = results["model.predict"]["p50"] / results["NumpyPolicy.predict"]["p50"]
+    print(f"   └─ Aceleración (p50): {speedup:.0f}x | diferencia máxima {error:.2e}")
+    return results
+
+
+# Pico de memoria del propio hijo: en Linux ru_maxrss se hereda a través de exec
+# y daría el pico del proceso que lanza el benchmark, VmHWM no
+STARTUP_SCRIPT = """
+import json, sys
+from instrumentation import max_rss_mb
+from test_model import TractorTester
+tester = TractorTester({path!r}, use_keras={use_keras})
+try:
+    with open("/proc/self/status") as f:
+        rss_mb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:")) / 1024
+except (OSError, StopIteration):
+    rss_mb = max_rss_mb()
+print(json.dumps({{"rss_mb": rss_mb,
+                  "loaded": tester.policy is not None,
+                  "tensorflow": "tensorflow" in sys.modules}}))
+"""
+
+
+def bench_startup(model_path='tractor_model_final.h5'):
+    """Arranque en frío y memoria de TractorTester en un proceso nuevo: NumPy frente a Keras"""
+    results = {}
+    for name, use_keras in [("numpy", False), ("keras", True)]:
+        script = STARTUP_SCRIPT.format(path=model_path, use_keras=use_keras)
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        lines = proc.stdout.strip().splitlines()
+        if proc.returncode != 0 or not lines:
+            print(f"   ├─ {name}: no disponible ({proc.stderr.strip().splitlines()[-1:]})")
+            continue
+        info = json.loads(lines[-1])
+        if not info["loaded"]:
+            print(f"   ├─ {name}: no disponible (el modelo no se pudo cargar)")
+            continue
+        results[name] = {"seconds": elapsed, **info}
+        memory = f" | {info['rss_mb']:.0f} MB" if info["rss_mb"] is not None else ""
+        print(f"   ├─ {name}: {elapsed:.2f} s{memory} | TensorFlow cargado: {info['tensorflow']}")
+    print(f"   └─ Modelo: {model_path}")
+    return results
+
+
+def bench_codec(iterations=20000, seed=0):
+    """Coste por paso de cada protocolo: codificar/decodificar acción y estado"""
+    from protocol import CODECS
+
+    rng = np.random.default_rng(seed)
+    obs = rng.uniform(-1, 1, 7).tolist()
+    action = tuple(rng.uniform(-1, 1, 3))
+    results = {}
+    for name, codec in CODECS.items():
+        action_msg = codec.encode_action(action)
+        state_msg = codec.encode_state(obs, 0.5, False, 12.5, 100)
+
+        # Lado Python (entrenador) y lado simulador de un paso completo
+        client = time_calls(lambda: (codec.encode_action(action), codec.decode_state(state_msg)), iterations)
+        server = time_calls(lambda: (codec.decode_action(action_msg), codec.encode_state(obs, 0.5, False, 12.5, 100)),
+                            iterations)
+        size = len(action_msg) + len(state_msg)
+        results[name] = {"client": client, "server": server, "bytes": size}
+        print(f"   ├─ {name}: cliente {client * 1e6:.1f} µs | servidor {server * 1e6:.1f} µs | {size} bytes/paso")
+
+    print(f"   └─ Aceleración (cliente): {results['json']['client'] / results['binary']['client']:.1f}x")
+    return results
+
+
+def bench_sim(sizes=(1, 1024), steps=200, seed=0):
+    """Pasos de entorno por segundo del simulador NumPy en proceso (sin red)"""
+    rng = np.random.default_rng(seed)
+    results = {}
+    for n in sizes:
+        sim = FieldSim(n, seed=seed)
+        actions = np.column_stack([rng.uniform(0.5, 1.0, n), rng.uniform(-0.8, 0.8, n), np.zeros(n)])
+
+        def step():
+            _, _, dones, _ = sim.step(actions)
+            if dones.any():
+                sim.reset(np.flatnonzero(dones))
+
+        per_step = time_calls(step, steps)
+        results[str(n)] = {"env_steps_per_sec": n / per_step, "step_seconds": per_step}
+        print(f"   ├─ {n} campos: {n / per_step:,.0f} pasos de entorno/seg | {per_step * 1e3:.2f} ms/paso")
+    print(f"   └─ {steps} pasos por tamaño")
+    return results
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def local_sim_server(seed=0, timeout=10):
+    """Arranca `sim_env.py` en un proceso aparte y devuelve su URI; se cierra al salir"""
+    port = _free_port()
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sim_env.py")
+    proc = subprocess.Popen([sys.executable, script, "--port", str(port), "--seed", str(seed)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                socket.create_connection(("localhost", port), timeout=0.5).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline or proc.poll() is not None:
+                    raise TimeoutError(f"El simulador no responde en el puerto {port}")
+                time.sleep(0.1)
+        yield endpoints_for_ports([port])[0]
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def _make_actor(seed=0):
+    """act_batch de un TractorAgent; sin Keras, una red 7-24-24-3 aleatoria con NumpyPolicy"""
+    try:
+        from train_tractor import TractorAgent
+    except ImportError:
+        rng = np.random.default_rng(seed)
+        policy = NumpyPolicy([(rng.normal(0, 0.3, (7, 24)), np.zeros(24), "relu"),
+                              (rng.normal(0, 0.3, (24, 24)), np.zeros(24), "relu"),
+                              (rng.normal(0, 0.3, (24, 3)), np.zeros(3), "linear")])
+        return "numpy", lambda obs: np.clip(policy.predict(obs), [0, -1, 0], [1, 1, 0.2])
+
+    agent = TractorAgent()
+    agent.epsilon = 0.0  # Medir siempre el camino de explotación (predicción)
+    return "agent", agent.act_batch
+
+
+async def _run_loop(uri, num_envs, protocol, steps, actor, warmup=10):
+    env = VecTractorEnv([uri] * num_envs, protocol=protocol, lockstep=True)
+    await env.connect()
+    try:
+        obs = await env.reset()
+        act_times = np.empty(steps)
+        step_times = np.empty(steps)
+        for i in range(-warmup, steps):
+            if i == 0:
+                start = time.perf_counter()
+            t0 = time.perf_counter()
+            actions = actor(obs)
+            t1 = time.perf_counter()
+            obs, _, dones, _ = await env.step(actions)
+            t2 = time.perf_counter()
+            if i >= 0:
+                act_times[i] = t1 - t0
+                step_times[i] = t2 - t1
+            if dones.any():
+                done_idx = np.flatnonzero(dones)
+                obs[done_idx] = await env.reset(done_idx)
+        elapsed = time.perf_counter() - start
+    finally:
+        await env.close()
+
+    return {
+        "env_steps_per_sec": steps * num_envs / elapsed,
+        "act_p50": float(np.percentile(act_times, 50)),
+        "act_p99": float(np.percentile(act_times, 99)),
+        "step_p50": float(np.percentile(step_times, 50)),
+        "step_p99": float(np.percentile(step_times, 99)),
+    }
+
+
+def bench_loop(num_envs=4, steps=500, protocols=("json", "binary"), seed=0):
+    """Bucle actuar → enviar → recibir contra el simulador NumPy servido por websocket"""
+    actor_name, actor = _make_actor(seed)
+    results = {"actor": actor_name}
+    with local_sim_server(seed) as uri:
+        for protocol in protocols:
+            np.random.seed(seed)
+            r = asyncio.run(_run_loop(uri, num_envs, protocol, steps, actor))
+            results[protocol] = r
+            print(f"   ├─ {protocol}: {r['env_steps_per_sec']:.0f} pasos de entorno/seg "
+                  f"| acción p50 {r['act_p50'] * 1e6:.0f} µs p99 {r['act_p99'] * 1e6:.0f} µs "
+                  f"| ida y vuelta p50 {r['step_p50'] * 1e6:.0f} µs p99 {r['step_p99'] * 1e6:.0f} µs")
+    print(f"   └─ {num_envs} conexiones en lockstep, {steps} pasos, actor: {actor_name}")
+    return results
+
+
+async def _run_fleet(server, endpoints, duration, warmup=0.5):
+    task = asyncio.create_task(server.drive_fleet(endpoints, protocol="binary"))
+    await asyncio.sleep(warmup)
+    start, actions = time.perf_counter(), server.actions
+    await asyncio.sleep(duration)
+    stats = server.stats()
+    stats["actions_per_sec"] = (stats["actions"] - actions) / (time.perf_counter() - start)
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+    return stats
+
+
+def bench_policy_server(clients=16, duration=3.0, batch_sizes=(1, 64), model_path='tractor_model_final.h5', seed=0):
+    """Flota de tractores del simulador conducida por una sola política, sin y con micro-batching"""
+    from policy_server import PolicyServer
+    from test_model import TractorTester
+
+    tester = TractorTester(model_path)
+    if tester.policy is None:
+        raise OSError(f"No se pudo cargar {model_path}")
+
+    results = {}
+    with local_sim_server(seed) as uri:
+        for max_batch in batch_sizes:
+            np.random.seed(seed)
+            server = PolicyServer(tester, max_batch=max_batch, report_interval=duration * 10)
+            stats = asyncio.run(_run_fleet(server, [uri] * clients, duration))
+            per_client_p99 = [c["p99"] for c in stats["per_client"].values() if c.get("count")]
+            r = {
+                "actions_per_sec": stats["actions_per_sec"],
+                "mean_batch": stats["mean_batch"],
+                "latency_p50": stats["latency"].get("p50", 0.0),
+                "latency_p99": stats["latency"].get("p99", 0.0),
+                "worst_client_p99": max(per_client_p99, default=0.0),
+            }
+            results[str(max_batch)] = r
+            print(f"   ├─ lote ≤ {max_batch}: {r['actions_per_sec']:.0f} acciones/seg | lote medio "
+                  f"{r['mean_batch']:.1f} | latencia p50 {r['latency_p50'] * 1e3:.2f} ms "
+                  f"p99 {r['latency_p99'] * 1e3:.2f} ms | peor cliente p99 {r['worst_client_p99'] * 1e3:.2f} ms")
+    print(f"   └─ {clients} tractores durante {duration:.0f} s")
+    return results
+
+
+def bench_profiler(iterations=100_000, seed=0):
+    """Coste de una medición start/stop con el Profiler activo y con el NullProfiler"""
+    from instrumentation import NULL_PROFILER, Profiler
+
+    results = {}
+    for name, profiler in [("activo", Profiler()), ("muestreo 1/10", Profiler(sample_every=10)),
+                           ("desactivado", NULL_PROFILER)]:
+        def span():
+            profiler.tick()
+            profiler.stop("act", profiler.start())
+
+        per_span = time_calls(span, iterations)
+        results[name] = per_span
+        print(f"   ├─ {name}: {per_span * 1e9:.0f} ns/paso instrumentado")
+    # train_agent mide unas 8 etapas por paso
+    print(f"   └─ Coste activo con 8 etapas sobre un paso de 1 ms: {8 * results['activo'] / 1e-3:.2%}")
+    return results
+
+
+def _episodes_to_threshold(agent, replay, episodes, num_envs, max_steps, threshold, window, seed):
+    """Entrena contra FieldSim y devuelve el progreso máximo de cada episodio y el primero que cruza el umbral"""
+    sim = FieldSim(num_envs, seed=seed)
+    obs = sim.reset()
+    steps = np.zeros(num_envs, dtype=np.int64)
+    max_progress = np.zeros(num_envs)
+    curve = []
+    tick = 0
+    while len(curve) < episodes:
+        actions = agent.act_batch(obs)
+        next_obs, rewards, dones, progress = sim.step(actions)
+        agent.memory.add_batch(obs, actions, rewards, next_obs, dones)
+        if len(agent.memory) > agent.batch_size and tick % agent.train_interval == 0:
+            replay()
+        tick += 1
+        obs = next_obs
+        steps += 1
+        max_progress = np.maximum(max_progress, progress)
+
+        finished = np.flatnonzero(dones | (steps >= max_steps))
+        if finished.size:
+            curve.extend(max_progress[finished].tolist())
+            agent.epsilon = max(agent.epsilon_min, agent.epsilon * agent.epsilon_decay ** finished.size)
+            obs[finished] = sim.reset(finished)
+            steps[finished] = 0
+            max_progress[finished] = 0.0
+
+    curve = np.array(curve[:episodes])
+    # Media móvil de `window` episodios para no premiar un episodio suelto con suerte
+    smoothed = np.convolve(curve, np.ones(window) / window, mode="valid")
+    reached = np.flatnonzero(smoothed >= threshold)
+    return curve, int(reached[0] + window) if reached.size else None
+
+
+def bench_sample_efficiency(episodes=600, num_envs=8, max_steps=500, threshold=1.3, window=20, seed=0):
+    """Episodios hasta que el progreso medio supera `threshold`% en el simulador NumPy
+
+    Compara el replay sin red objetivo (referencia) con red objetivo dura y
+    suave, ambas con Double DQN. Misma semilla de red, exploración y campos
+    en cada variante; None significa que no se alcanzó el umbral. Con 600
+    episodios epsilon llega a ~0.05, y el 1.3% lo alcanza la referencia
+    hacia el episodio 200: por debajo de eso solo se mide exploración.
+    """
+    import keras
+
+    from train_tractor import TractorAgent
+
+    variants = {
+        "online (antes)": dict(target_update=None, double_dqn=False),
+        "objetivo hard + double": dict(target_update="hard"),
+        "objetivo soft + double": dict(target_update="soft"),
+    }
+    results = {}
+    for name, options in variants.items():
+        random.seed(seed)
+        np.random.seed(seed)
+        keras.utils.set_random_seed(seed)
+        agent = TractorAgent(memory_size=20_000, **options)
+        replay = (lambda: replay_online(agent)) if options["target_update"] is None else agent.replay
+        start = time.perf_counter()
+        curve, reached = _episodes_to_threshold(agent, replay, episodes, num_envs, max_steps, threshold, window, seed)
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "episodes_to_threshold": reached,
+            "final_progress": float(curve[-window:].mean()),
+            "best_progress": float(curve.max()),
+            "seconds": elapsed,
+        }
+        shown = reached if reached is not None else f"> {episodes}"
+        print(f"   ├─ {name}: {shown} episodios hasta {threshold:.1f}% | progreso final "
+              f"{curve[-window:].mean():.2f}% | {elapsed:.1f} s")
+    print(f"   └─ {episodes} episodios de {max_steps} pasos, {num_envs} campos en paralelo, media de {window}")
+    return results
+
+
+def bench_dataset(transitions=500_000, shard_size=65536, batch_size=256, seed=0):
+    """Grabación en shards, lectura barajada con prefetch y entrenamiento offline por lotes"""
+    import tempfile
+
+    from dataset import ShardLoader, TransitionRecorder, pretrain
+
+    rng = np.random.default_rng(seed)
+    step = 64  # un paso de VecTractorEnv con 64 instancias
+    obs = rng.uniform(-1, 1, (step, 7)).astype(np.float32)
+    actions = rng.uniform(-1, 1, (step, 3)).astype(np.float32)
+    rewards = rng.normal(size=step).astype(np.float32)
+    dones = rng.random(step) < 0.01
+
+    results = {}
+    with tempfile.TemporaryDirectory() as path:
+        recorder = TransitionRecorder(path, shard_size)
+        start = time.perf_counter()
+        for _ in range(transitions // step):
+            recorder.add_batch(obs, actions, rewards, obs, dones)
+        recorder.close()
+        elapsed = time.perf_counter() - start
+        results["record_per_sec"] = len(recorder) / elapsed
+        print(f"   ├─ Grabación: {len(recorder) / elapsed:,.0f} transiciones/seg")
+
+        loader = ShardLoader(path, batch_size, seed=seed)
+        start = time.perf_counter()
+        seen = sum(len(batch["reward"]) for batch in loader)
+        elapsed = time.perf_counter() - start
+        results["load_per_sec"] = seen / elapsed
+        print(f"   ├─ Lectura barajada: {seen / elapsed:,.0f} transiciones/seg ({len(loader)} lotes de {batch_size})")
+
+        try:
+            from train_tractor import TractorAgent
+        except ImportError as e:
+            print(f"   └─ Entrenamiento offline no disponible: {e}")
+            return results
+        history = pretrain(TractorAgent(), path, epochs=1, batch_size=batch_size, seed=seed)
+        results["train_per_sec"] = history[0]["transitions_per_sec"]
+        print(f"   └─ Entrenamiento offline: {results['train_per_sec']:,.0f} transiciones/seg")
+    return results
+
+
+def git_commit():
+    proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    return proc.stdout.strip() or None
+
+
+def flatten(results, prefix=""):
+    """Aplana resultados anidados a {"bench.clave.subclave": número}"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(previous, current):
+    """Imprime la relación actual/anterior de cada métrica común a dos informes"""
+    old = flatten({k: v.get("results", {}) for k, v in previous["benchmarks"].items()})
+    new = flatten({k: v.get("results", {}) for k, v in current["benchmarks"].items()})
+    print(f"\n🔍 Comparación {previous.get('commit')} → {current.get('commit')}")
+    for name in sorted(old.keys() & new.keys()):
+        if old[name]:
+            print(f"   {name}: {old[name]:.4g} → {new[name]:.4g} ({new[name] / old[name]:.2f}x)")
+
+
+def run(names, seed=0):
+    """Ejecuta los benchmarks con semillas fijas y devuelve un informe serializable a JSON"""
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seed": seed,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "benchmarks": {},
+    }
+    for name in names:
+        print(f"⏱️  Benchmark: {name}")
+        fn = BENCHMARKS[name]
+        random.seed(seed)
+        np.random.seed(seed)
+        kwargs = {"seed": seed} if "seed" in inspect.signature(fn).parameters else {}
+        start = time.perf_counter()
+        try:
+            entry = {"results": fn(**kwargs)}
+        except (ImportError, OSError) as e:
+            print(f"   └─ No disponible: {type(e).__name__}: {e}")
+            entry = {"error": f"{type(e).__name__}: {e}"}
+        entry["seconds"] = time.perf_counter() - start
+        # Pico acumulado del proceso al terminar este benchmark
+        entry["max_rss_mb"] = max_rss_mb()
+        report["benchmarks"][name] = entry
+    report["max_rss_mb"] = max_rss_mb()
+    # Sin el módulo resource (Windows) se omite la cifra, no el informe
+    if report["max_rss_mb"] is not None:
+        print(f"💾 Pico de memoria: {report['max_rss_mb']:.0f} MB")
+    return report
+
+
+BENCHMARKS = {
+    "replay": bench_replay,
+    "memory": bench_memory,
+    "per": bench_per,
+    "inference": bench_inference,
+    "startup": bench_startup,
+    "codec": bench_codec,
+    "sim": bench_sim,
+    "loop": bench_loop,
+    "policy_server": bench_policy_server,
+    "profiler": bench_profiler,
+    "sample_efficiency": bench_sample_efficiency,
+    "dataset": bench_dataset,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks del agente tractor")
+    parser.add_argument("bench", nargs="*", default=list(BENCHMARKS), choices=list(BENCHMARKS))
+    parser.add_argument("--seed", type=int, default=0, help="Semilla de todos los benchmarks")
+    parser.add_argument("--output", default=None, help="Guardar el informe en JSON (p. ej. bench_<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Informe JSON anterior con el que comparar")
+    args = parser.parse_args()
+
+    report = run(args.bench, seed=args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Informe guardado en {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
@@ -0,0 +1,218 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from replay_buffer import ReplayBuffer
+
+CHECKPOINT_PREFIX = "ckpt_"
+
+
+def _optimizer_variables(model):
+    """Variables del optimizador (momentos de Adam, contador de pasos) o [] si no hay"""
+    optimizer = getattr(model, "optimizer", None)
+    if optimizer is None:
+        return []
+    variables = optimizer.variables
+    return list(variables() if callable(variables) else variables)
+
+
+def capture(agent, episode, include_optimizer=True):
+    """Copia en memoria todo el estado necesario para reanudar
+
+    Es la única parte que corre en el bucle de entrenamiento: solo copia
+    arrays, la escritura a disco la hace CheckpointManager en otro hilo.
+    Una memoria respaldada en disco (`memory_path`) no se copia: el
+    checkpoint apunta a su directorio, que sigue avanzando después, y
+    `write` la vuelca a disco desde el hilo de escritura.
+    """
+    optimizer = [np.array(v) for v in _optimizer_variables(agent.model)] if include_optimizer else []
+    memory_path = getattr(agent.memory, "path", None)
+    memory = None if memory_path else agent.memory.snapshot()
+    return {
+        "state": {
+            "episode": int(episode),
+            "epsilon": float(agent.epsilon),
+            "train_steps": int(getattr(agent, "train_steps", 0)),
+            "memory_class": type(agent.memory).__name__,
+            "memory_size": len(agent.memory),
+            "memory_capacity": agent.memory.capacity,
+            "memory_ptr": agent.memory.ptr,
+            "memory_path": memory_path,
+            "history_path": agent.history.path,
+            "time": time.time(),
+        },
+        "weights": [np.array(w) for w in agent.model.get_weights()],
+        "target": [np.array(w) for w in agent.target.get_weights()],
+        "optimizer": optimizer,
+        "memory": memory,
+        "memory_source": agent.memory if memory_path else None,
+    }
+
+
+def write(snapshot, path):
+    """Escribe un checkpoint en el directorio `path` y devuelve su tamaño en bytes"""
+    os.makedirs(path, exist_ok=True)
+    if snapshot.get("memory_source") is not None:
+        # msync de las páginas pendientes del memmap: puede tardar, por eso va aquí y no en capture
+        snapshot["memory_source"].flush()
+    np.savez(os.path.join(path, "weights.npz"), *snapshot["weights"])
+    np.savez(os.path.join(path, "target.npz"), *snapshot["target"])
+    np.savez(os.path.join(path, "optimizer.npz"), *snapshot["optimizer"])
+    if snapshot["memory"] is not None:
+        # Sin comprimir: la memoria de repetición es casi toda ruido en float32
+        np.savez(os.path.join(path, "memory.npz"), **snapshot["memory"])
+    with open(os.path.join(path, "state.json"), "w") as f:
+        json.dump(snapshot["state"], f, indent=2)
+    return sum(entry.stat().st_size for entry in os.scandir(path))
+
+
+def load(path):
+    """Lee un checkpoint escrito por `write`"""
+    with open(os.path.join(path, "state.json")) as f:
+        state = json.load(f)
+    with np.load(os.path.join(path, "weights.npz")) as data:
+        weights = [data[f"arr_{i}"] for i in range(len(data.files))]
+    target = []
+    if os.path.exists(os.path.join(path, "target.npz")):
+        with np.load(os.path.join(path, "target.npz")) as data:
+            target = [data[f"arr_{i}"] for i in range(len(data.files))]
+    with np.load(os.path.join(path, "optimizer.npz")) as data:
+        optimizer = [data[f"arr_{i}"] for i in range(len(data.files))]
+    memory = None
+    if os.path.exists(os.path.join(path, "memory.npz")):
+        with np.load(os.path.join(path, "memory.npz")) as data:
+            memory = {name: data[name] for name in data.files}
+    return {"state": state, "weights": weights, "target": target, "optimizer": optimizer, "memory": memory}
+
+
+def restore(agent, snapshot, restore_memory=True):
+    """Aplica un checkpoint cargado al agente; devuelve el número de episodio guardado
+
+    Con `restore_memory=False` se conserva la memoria actual del agente (p. ej.
+    la recuperada de un memory_path).
+    """
+    agent.set_weights(snapshot["weights"])
+    # Los checkpoints anteriores a la red objetivo no la incluyen: parte de los pesos online
+    if snapshot.get("target"):
+        agent.target.set_weights(snapshot["target"])
+    _restore_optimizer(agent.model, snapshot["optimizer"])
+    agent.epsilon = snapshot["state"]["epsilon"]
+    agent.train_steps = snapshot["state"].get("train_steps", 0)
+    if restore_memory:
+        _restore_memory(agent.memory, snapshot)
+    return snapshot["state"]["episode"]
+
+
+def _restore_memory(memory, snapshot):
+    if snapshot["memory"] is not None:
+        memory.restore(snapshot["memory"])
+        return
+    # Checkpoint de una memoria en disco: se copian sus filas si el agente usa otra
+    state = snapshot["state"]
+    path = state.get("memory_path")
+    if not path or path == getattr(memory, "path", None):
+        return
+    if not os.path.isdir(path):
+        print(f"⚠️ La memoria del checkpoint ({path}) ya no existe: se empieza vacía")
+        return
+    memory.restore(ReplayBuffer(state["memory_capacity"], path=path).snapshot())
+
+
+def _restore_optimizer(model, values):
+    if not values:
+        return
+    variables = _optimizer_variables(model)
+    if len(variables) != len(values) and hasattr(model.optimizer, "build"):
+        # El optimizador crea sus variables en el primer paso: se construyen ya para poder asignarlas
+        model.optimizer.build(model.trainable_variables)
+        variables = _optimizer_variables(model)
+    if len(variables) != len(values):
+        print(f"⚠️ Estado del optimizador incompatible ({len(values)} variables guardadas, "
+              f"{len(variables)} en el modelo): se reinicia")
+        return
+    for variable, value in zip(variables, values):
+        variable.assign(value)
+
+
+def latest(directory):
+    """Ruta del checkpoint más reciente dentro de `directory`, o None"""
+    if not os.path.isdir(directory):
+        return None
+    names = sorted(name for name in os.listdir(directory)
+                   if name.startswith(CHECKPOINT_PREFIX) and not name.endswith(".tmp"))
+    return os.path.join(directory, names[-1]) if names else None
+
+
+def resolve(path):
+    """Acepta un checkpoint concreto o un directorio de checkpoints (se toma el último)"""
+    if os.path.exists(os.path.join(path, "state.json")):
+        return path
+    found = latest(path)
+    if found is None:
+        raise FileNotFoundError(f"No hay checkpoints en {path}")
+    return found
+
+
+class CheckpointManager:
+    """Guarda checkpoints periódicos sin bloquear el bucle de entrenamiento
+
+    `save()` copia el estado en memoria y delega la escritura en un hilo:
+    cada checkpoint se escribe en `ckpt_<episodio>.tmp` y se renombra al
+    terminar, así que nunca queda uno a medias con nombre válido. Solo se
+    conservan los `keep` más recientes. Si el anterior todavía se está
+    escribiendo, el nuevo se omite en lugar de esperar.
+    """
+
+    def __init__(self, directory="checkpoints", keep=3):
+        self.directory = directory
+        self.keep = keep
+        self.last_result = None
+        self.last_episode = None
+        self._thread = None
+
+    def save(self, agent, episode, include_optimizer=True, block=False):
+        if self._thread is not None and self._thread.is_alive():
+            if not block:
+                print(f"⏭️ Checkpoint del episodio {episode} omitido: el anterior aún se está escribiendo")
+                return False
+            self._thread.join()
+        snapshot = capture(agent, episode, include_optimizer)
+        self.last_episode = episode
+        self._thread = threading.Thread(target=self._write, args=(snapshot,), daemon=True)
+        self._thread.start()
+        if block:
+            self.wait()
+        return True
+
+    def _write(self, snapshot):
+        name = f"{CHECKPOINT_PREFIX}{snapshot['state']['episode']:08d}"
+        final = os.path.join(self.directory, name)
+        tmp = final + ".tmp"
+        start = time.perf_counter()
+        try:
+            shutil.rmtree(tmp, ignore_errors=True)
+            size = write(snapshot, tmp)
+            shutil.rmtree(final, ignore_errors=True)
+            os.replace(tmp, final)
+            self._rotate()
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el checkpoint {name}: {e}")
+            return
+        elapsed = time.perf_counter() - start
+        self.last_result = {"path": final, "seconds": elapsed, "bytes": size}
+        print(f"💾 Checkpoint {name}: {size / 2**20:.1f} MB en {elapsed:.2f} s")
+
+    def _rotate(self):
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith(CHECKPOINT_PREFIX) and not name.endswith(".tmp"))
+        for name in names[:-self.keep]:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def wait(self):
+        """Espera a que termine la escritura en curso"""
+        if self._thread is not None:
+            self._thread.join()
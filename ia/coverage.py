@@ -0,0 +1,123 @@
+import numpy as np
+
+# Tipos de celda, igual que TipoTerreno en terreno02.gd
+TIERRA_SIN_ARAR = 0
+TIERRA_ARADA = 1
+OBSTACULO = 2
+
+
+class CoverageMap:
+    """Mapa de cobertura de N campos en el lado de Python
+
+    Una matriz uint8 (N, filas, columnas) con los códigos de TipoTerreno y
+    un contador de celdas aradas por campo que se mantiene al marcar, así
+    que el progreso no recorre nunca la matriz. Cada actualización toca una
+    celda por campo (O(1)) y cada parche local lee solo su vecindario, de
+    modo que el coste no depende del tamaño del campo: 1000x1000 celdas son
+    1 MB por campo.
+
+    Las posiciones son (x, z) en metros de Godot y se convierten a celda
+    como en `obtener_tipo_terreno`. Sin información de obstáculos (Godot
+    no la envía) todo el campo cuenta como tierra.
+    """
+
+    def __init__(self, num_envs=1, rows=40, cols=40, spacing=2.0):
+        self.num_envs = num_envs
+        self.rows = rows
+        self.cols = cols
+        self.spacing = spacing
+        self.grid = np.zeros((num_envs, rows, cols), dtype=np.uint8)
+        self.total_land = np.full(num_envs, rows * cols, dtype=np.int64)
+        self.plowed = np.zeros(num_envs, dtype=np.int64)
+
+    def _indices(self, indices):
+        return np.arange(self.num_envs) if indices is None else np.asarray(indices)
+
+    def reset(self, indices=None, obstacles=None):
+        """Vacía los campos de `indices`; `obstacles` es una máscara booleana (len(indices), filas, columnas)"""
+        idx = self._indices(indices)
+        if obstacles is None:
+            self.grid[idx] = TIERRA_SIN_ARAR
+            self.total_land[idx] = self.rows * self.cols
+        else:
+            self.grid[idx] = np.where(obstacles, OBSTACULO, TIERRA_SIN_ARAR)
+            self.total_land[idx] = self.rows * self.cols - obstacles.reshape(len(idx), -1).sum(axis=1)
+        self.plowed[idx] = 0
+
+    def _cell_index(self, pos):
+        """Celda (i, j) sin recortar de cada posición (x, z), truncando como int() en GDScript"""
+        pos = np.asarray(pos, dtype=np.float64).reshape(-1, 2)
+        j = np.trunc(pos[:, 0] / self.spacing + self.cols / 2.0).astype(np.int64)
+        i = np.trunc(pos[:, 1] / self.spacing + self.rows / 2.0).astype(np.int64)
+        return i, j
+
+    def cells(self, pos):
+        """Índices (i, j) de celda recortados al campo y si la posición cae dentro"""
+        i, j = self._cell_index(pos)
+        inside = (i >= 0) & (i < self.rows) & (j >= 0) & (j < self.cols)
+        return np.clip(i, 0, self.rows - 1), np.clip(j, 0, self.cols - 1), inside
+
+    def terrain_type(self, pos, indices=None):
+        """Tipo de celda bajo cada posición; fuera del campo es OBSTACULO como en Godot"""
+        idx = self._indices(indices)
+        i, j, inside = self.cells(pos)
+        return np.where(inside, self.grid[idx, i, j], OBSTACULO)
+
+    def plow(self, pos, active=None, indices=None):
+        """Ara la celda bajo la posición del surcador de cada campo; devuelve qué campos ganaron una celda"""
+        idx = self._indices(indices)
+        i, j, inside = self.cells(pos)
+        fresh = inside & (self.grid[idx, i, j] == TIERRA_SIN_ARAR)
+        if active is not None:
+            fresh &= np.asarray(active, dtype=bool)
+        self.grid[idx[fresh], i[fresh], j[fresh]] = TIERRA_ARADA
+        self.plowed[idx] += fresh
+        return fresh
+
+    def plow_path(self, start, end, ticks, active=None, indices=None):
+        """Ara las celdas de `ticks` puntos equiespaciados de `start` a `end` (incluido) en cada campo
+
+        Godot marca la celda del surcador en cada tick de física; cuando
+        entre dos estados pasan k ticks (lockstep con repeat=k) solo se
+        conocen los extremos, así que se aproximan las k posiciones
+        intermedias sobre la recta. Con ticks=1 equivale a `plow(end)`.
+        Devuelve cuántas celdas ganó cada campo.
+        """
+        start = np.asarray(start, dtype=np.float64).reshape(-1, 2)
+        end = np.asarray(end, dtype=np.float64).reshape(-1, 2)
+        ticks = np.maximum(np.broadcast_to(np.asarray(ticks, dtype=np.int64), len(end)), 1)
+        gained = np.zeros(len(end), dtype=np.int64)
+        for k in range(1, int(ticks.max()) + 1):
+            # Los campos con menos ticks repiten su punto final, que ya no suma
+            t = np.minimum(k / ticks, 1.0)[:, None]
+            gained += self.plow(start + (end - start) * t, active, indices)
+        return gained
+
+    def progress(self):
+        """Porcentaje arado de cada campo, como obtener_progreso_arado()"""
+        return np.where(self.total_land > 0, self.plowed / np.maximum(self.total_land, 1) * 100.0, 0.0)
+
+    def patch(self, pos, radius=8, factor=2, indices=None):
+        """Vecindario de 2·radius celdas alrededor de cada posición, reducido por `factor`
+
+        Cada valor es la fracción de tierra sin arar del bloque de
+        factor x factor celdas (lo que queda por hacer cerca del tractor);
+        fuera del campo cuenta como obstáculo. Devuelve float32
+        (N, 2·radius/factor, 2·radius/factor) leyendo solo esas celdas.
+        """
+        size = 2 * radius
+        if size % factor:
+            raise ValueError(f"2·radius ({size}) debe ser múltiplo de factor ({factor})")
+        idx = self._indices(indices)
+        i, j = self._cell_index(pos)
+        offsets = np.arange(-radius, radius)
+        rows = i[:, None] + offsets
+        cols = j[:, None] + offsets
+        inside = (((rows >= 0) & (rows < self.rows))[:, :, None]
+                  & ((cols >= 0) & (cols < self.cols))[:, None, :])
+        cells = self.grid[idx[:, None, None],
+                          np.clip(rows, 0, self.rows - 1)[:, :, None],
+                          np.clip(cols, 0, self.cols - 1)[:, None, :]]
+        pending = (cells == TIERRA_SIN_ARAR) & inside
+        k = size // factor
+        return pending.reshape(len(idx), k, factor, k, factor).mean(axis=(2, 4), dtype=np.float32)
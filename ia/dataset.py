@@ -0,0 +1,258 @@
+import argparse
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from npy_chunks import count_chunks, read_chunks, write_chunk
+from replay_buffer import ACTION_DIM, FIELDS, OBS_DIM
+
+SHAPES = {
+    "obs": (OBS_DIM,),
+    "action": (ACTION_DIM,),
+    "reward": (),
+    "next_obs": (OBS_DIM,),
+    "done": (),
+}
+
+
+class TransitionRecorder:
+    """Graba transiciones (obs, action, reward, next_obs, done) en shards `.npy`
+
+    Las transiciones se acumulan en arrays preasignados de `shard_size`
+    filas y cada shard lleno se escribe de una vez como un `.npy` por campo
+    (`obs_000000.npy`, `reward_000000.npy`...), que luego se leen con
+    memmap sin cargarlos, con el mismo formato que el historial de
+    MetricsLog (npy_chunks). Cada escritura es atómica (tmp + replace) y
+    `flush()` vuelca también el shard a medias, así que tras una caída se
+    pierde como mucho lo grabado desde el último volcado. Al reabrir un
+    directorio existente se sigue en el shard siguiente.
+    """
+
+    def __init__(self, path, shard_size=65536):
+        self.path = path
+        self.shard_size = int(shard_size)
+        os.makedirs(path, exist_ok=True)
+        self._shard = count_chunks(path, "reward")
+        self._buffer = {field: np.zeros((self.shard_size,) + shape, dtype=np.float32)
+                        for field, shape in SHAPES.items()}
+        self._fill = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, state, action, reward, next_state, done):
+        self.add_batch([state], [action], [reward], [next_state], [done])
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """Añade un lote de transiciones (p. ej. un paso de VecTractorEnv)"""
+        batch = dict(zip(FIELDS, (states, actions, rewards, next_states, dones)))
+        n = len(rewards)
+        start = 0
+        while start < n:
+            take = min(n - start, self.shard_size - self._fill)
+            for field, values in batch.items():
+                self._buffer[field][self._fill:self._fill + take] = values[start:start + take]
+            self._fill += take
+            start += take
+            if self._fill == self.shard_size:
+                self._write_shard()
+                self._shard += 1
+                self._fill = 0
+        self.count += n
+
+    def _write_shard(self):
+        write_chunk(self.path, self._shard, {field: self._buffer[field][:self._fill] for field in FIELDS})
+
+    def flush(self):
+        """Escribe el shard a medias; se reescribe entero en el siguiente volcado o al llenarse"""
+        if self._fill:
+            self._write_shard()
+
+    def close(self):
+        self.flush()
+
+
+def read_shards(paths):
+    """Shards de uno o varios directorios grabados, como dicts de memmaps de solo lectura"""
+    if isinstance(paths, str):
+        paths = [paths]
+    shards = []
+    for path in paths:
+        shards.extend(shard for shard in read_chunks(path, FIELDS) if len(shard["reward"]))
+    return shards
+
+
+def count_transitions(paths):
+    return sum(len(shard["reward"]) for shard in read_shards(paths))
+
+
+_END = object()
+
+
+class ShardLoader:
+    """Lotes barajados de los shards grabados, preparados en un hilo aparte
+
+    En cada época se baraja el orden de los shards y se cargan de
+    `shuffle_shards` en `shuffle_shards`: se mezclan sus transiciones con
+    una sola permutación y los lotes salen como vistas contiguas, sin
+    copiar por lote. Un hilo productor mantiene hasta `prefetch` lotes
+    listos mientras la red entrena (NumPy suelta el GIL en las copias
+    grandes), así que solo hay en RAM unos pocos shards a la vez.
+    """
+
+    def __init__(self, paths, batch_size=256, shuffle_shards=4, prefetch=8, seed=None):
+        self.shards = read_shards(paths)
+        if not self.shards:
+            raise FileNotFoundError(f"No hay transiciones grabadas en {paths}")
+        self.batch_size = batch_size
+        self.shuffle_shards = max(1, shuffle_shards)
+        self.prefetch = prefetch
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        """Lotes completos por época"""
+        return sum(len(shard["reward"]) for shard in self.shards) // self.batch_size
+
+    def _batches(self):
+        order = self.rng.permutation(len(self.shards))
+        carry = None
+        for start in range(0, len(order), self.shuffle_shards):
+            group = [self.shards[k] for k in order[start:start + self.shuffle_shards]]
+            if carry is not None:
+                group.append(carry)
+            data = {field: np.concatenate([shard[field] for shard in group]) for field in FIELDS}
+            perm = self.rng.permutation(len(data["reward"]))
+            data = {field: values[perm] for field, values in data.items()}
+            full = len(perm) // self.batch_size * self.batch_size
+            for b in range(0, full, self.batch_size):
+                yield {field: values[b:b + self.batch_size] for field, values in data.items()}
+            # El resto pasa al siguiente grupo para no descartar transiciones
+            carry = {field: values[full:] for field, values in data.items()}
+
+    def __iter__(self):
+        """Una época completa de lotes {campo: array}"""
+        batches = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        def put(item):
+            # Con espera acotada: si el consumidor abandona la época el hilo termina
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for batch in self._batches():
+                    if not put(batch):
+                        return
+                put(_END)
+            except Exception as e:
+                put(e)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            while True:
+                batch = batches.get()
+                if batch is _END:
+                    return
+                if isinstance(batch, Exception):
+                    raise batch
+                yield batch
+        finally:
+            stop.set()
+            producer.join()
+
+
+def pretrain(agent, paths, epochs=1, batch_size=256, shuffle_shards=4, prefetch=8, seed=0):
+    """Entrena el agente con transiciones grabadas, sin simulador
+
+    Usa el mismo paso que el replay en línea (TractorAgent.train_batch)
+    con lotes más grandes. Devuelve una lista por época con transiciones/seg
+    y el error TD absoluto medio.
+    """
+    loader = ShardLoader(paths, batch_size, shuffle_shards, prefetch, seed)
+    total = sum(len(shard["reward"]) for shard in loader.shards)
+    print(f"📦 {total:,} transiciones en {len(loader.shards)} shards | {len(loader)} lotes de {batch_size} por época")
+
+    history = []
+    for epoch in range(epochs):
+        start = time.perf_counter()
+        seen = 0
+        td_sum = 0.0
+        for batch in loader:
+            td_errors = agent.train_batch(batch["obs"], batch["reward"], batch["next_obs"], batch["done"])
+            td_sum += float(np.abs(td_errors).sum())
+            seen += len(td_errors)
+        elapsed = time.perf_counter() - start
+        result = {"epoch": epoch + 1, "transitions_per_sec": seen / elapsed if elapsed > 0 else 0.0,
+                  "mean_abs_td": td_sum / max(seen, 1), "seconds": elapsed}
+        history.append(result)
+        print(f"🧠 Época {epoch + 1}/{epochs}: {result['transitions_per_sec']:,.0f} transiciones/seg "
+              f"| |TD| medio {result['mean_abs_td']:.4f} | {elapsed:.1f} s")
+    return history
+
+
+def _load_initial_weights(agent, path):
+    """Parte de un modelo `.h5`/`.npz` o de un checkpoint (sin su memoria)"""
+    import checkpoint
+    from numpy_policy import NumpyPolicy
+
+    if os.path.isdir(path):
+        location = checkpoint.resolve(path)
+        checkpoint.restore(agent, checkpoint.load(location), restore_memory=False)
+        print(f"♻️ Pesos y optimizador de {location}")
+    else:
+        agent.set_weights(NumpyPolicy.load(path).get_weights())
+        print(f"♻️ Pesos de {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transiciones grabadas: resumen y entrenamiento offline")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    info = sub.add_parser("info", help="Resumen de uno o varios directorios grabados")
+    info.add_argument("paths", nargs="+")
+
+    train = sub.add_parser("pretrain", help="Entrenar el modelo con las transiciones grabadas")
+    train.add_argument("paths", nargs="+")
+    train.add_argument("--epochs", type=int, default=1)
+    train.add_argument("--batch-size", type=int, default=256)
+    train.add_argument("--shuffle-shards", type=int, default=4, help="Shards que se mezclan a la vez")
+    train.add_argument("--prefetch", type=int, default=8, help="Lotes preparados por adelantado")
+    train.add_argument("--seed", type=int, default=0)
+    train.add_argument("--init", default=None, help="Modelo .h5/.npz o checkpoint del que partir (ajuste fino)")
+    train.add_argument("--output", default="tractor_model_pretrained.h5")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        shards = read_shards(args.paths)
+        total = sum(len(shard["reward"]) for shard in shards)
+        episodes = int(sum(shard["done"].sum() for shard in shards))
+        size = sum(values.nbytes for shard in shards for values in shard.values())
+        print(f"📦 {total:,} transiciones | {episodes} episodios terminados | {len(shards)} shards "
+              f"| {size / 2**20:.1f} MB")
+        if total:
+            rewards = np.concatenate([shard["reward"] for shard in shards])
+            print(f"   └─ Recompensa media {rewards.mean():.3f} (mín {rewards.min():.2f}, máx {rewards.max():.2f})")
+    else:
+        from train_tractor import TractorAgent
+
+        agent = TractorAgent()
+        if args.init:
+            _load_initial_weights(agent, args.init)
+        pretrain(agent, args.paths, args.epochs, args.batch_size, args.shuffle_shards, args.prefetch, args.seed)
+        agent.model.save(args.output)
+        print(f"💾 Modelo guardado como: {args.output}")
+        export = os.path.splitext(args.output)[0] + ".npz"
+        agent.policy.set_weights(agent.model.get_weights())
+        agent.policy.save_npz(export)
+        print(f"💾 Exportado para inferencia sin Keras: {export}")
@@ -0,0 +1,187 @@
+import bisect
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+def max_rss_mb():
+    """Pico de memoria residente del proceso en MB, o None donde no hay `resource` (Windows)
+
+    ru_maxrss está en KB en Linux y en bytes en macOS.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 1024
+
+
+# Límites superiores de las cubetas: 1 µs … 10 s, 4 por década (+ una final para el resto)
+BUCKET_EDGES = np.logspace(-6, 1, 29)
+MAX_STAGES = 32
+
+
+class Profiler:
+    """Tiempos por etapa del bucle (recv, decode, act, replay...) en histogramas fijos
+
+    Se usa con `t = profiler.start()` ... `profiler.stop('act', t)`: no crea
+    objetos por medición y funciona con corrutinas concurrentes, que es
+    como se esperan los N `ws.recv` de VecTractorEnv. `tick()` marca cada
+    paso del bucle; solo se miden uno de cada `sample_every` pasos y cada
+    `flush_interval` segundos se vuelca el acumulado a `path`, en CSV,
+    JSONL o texto de Prometheus según la extensión (.csv, .jsonl, .prom).
+    """
+
+    def __init__(self, path=None, sample_every=1, flush_interval=10.0):
+        self.path = path
+        self.format = _format_for(path) if path else None
+        self.sample_every = max(1, int(sample_every))
+        self.flush_interval = flush_interval
+        self.recording = True
+        self._ticks = 0
+        self._next_flush = time.monotonic() + flush_interval
+        self._edges = BUCKET_EDGES.tolist()
+        self._index = {}
+        self.stages = []
+        # Listas de tamaño fijo: indexar una lista es bastante más barato que un escalar de NumPy
+        self._counts = [[0] * (len(self._edges) + 1) for _ in range(MAX_STAGES)]
+        self._sums = [0.0] * MAX_STAGES
+        self._maxs = [0.0] * MAX_STAGES
+
+    def tick(self):
+        """Avanza un paso del bucle: decide si se muestrea y vuelca si toca"""
+        self._ticks += 1
+        self.recording = self._ticks % self.sample_every == 0
+        if self.path and time.monotonic() >= self._next_flush:
+            self.flush()
+
+    def start(self):
+        """Marca de tiempo monotónica, o None si este paso no se muestrea"""
+        return time.perf_counter() if self.recording else None
+
+    def stop(self, stage, start):
+        """Registra el tiempo transcurrido desde `start` en el histograma de `stage`"""
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        i = self._index.get(stage)
+        if i is None:
+            i = self._register(stage)
+        self._counts[i][bisect.bisect_left(self._edges, elapsed)] += 1
+        self._sums[i] += elapsed
+        if elapsed > self._maxs[i]:
+            self._maxs[i] = elapsed
+
+    def _register(self, stage):
+        if len(self.stages) == MAX_STAGES:
+            raise ValueError(f"Demasiadas etapas instrumentadas (máximo {MAX_STAGES})")
+        self._index[stage] = len(self.stages)
+        self.stages.append(stage)
+        return self._index[stage]
+
+    def histogram(self, stage):
+        """Cuentas por cubeta de `stage` (la última cubeta no tiene límite superior)"""
+        return np.array(self._counts[self._index[stage]], dtype=np.int64)
+
+    def percentile(self, stage, q):
+        """Estimación por cubetas: límite superior de la cubeta que contiene el percentil q"""
+        counts = self.histogram(stage)
+        total = counts.sum()
+        if total == 0:
+            return 0.0
+        bucket = int(np.searchsorted(np.cumsum(counts), q / 100.0 * total))
+        return float(BUCKET_EDGES[bucket]) if bucket < len(BUCKET_EDGES) else self._maxs[self._index[stage]]
+
+    def summary(self):
+        """{etapa: {count, sum, mean, max, p50, p99}} con los tiempos en segundos"""
+        result = {}
+        for stage, i in self._index.items():
+            count = sum(self._counts[i])
+            result[stage] = {
+                "count": count,
+                "sum": self._sums[i],
+                "mean": self._sums[i] / count if count else 0.0,
+                "max": self._maxs[i],
+                "p50": self.percentile(stage, 50),
+                "p99": self.percentile(stage, 99),
+            }
+        return result
+
+    def flush(self):
+        """Escribe el acumulado actual en `path`"""
+        self._next_flush = time.monotonic() + self.flush_interval
+        if not self.path:
+            return
+        timestamp = time.time()
+        summary = self.summary()
+        if self.format == "jsonl":
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"time": timestamp, "ticks": self._ticks, "sample_every": self.sample_every,
+                                    "stages": summary}) + "\n")
+        elif self.format == "csv":
+            new_file = not os.path.exists(self.path)
+            with open(self.path, "a") as f:
+                if new_file:
+                    f.write("time,stage,count,sum,mean,max,p50,p99\n")
+                for stage, s in summary.items():
+                    f.write(f"{timestamp:.3f},{stage},{s['count']},{s['sum']:.6f},{s['mean']:.9f},"
+                            f"{s['max']:.9f},{s['p50']:.9f},{s['p99']:.9f}\n")
+        else:
+            # Formato de texto de Prometheus; se reemplaza el fichero entero de forma atómica
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp, self.path)
+
+    def prometheus_text(self):
+        lines = ["# HELP tractor_stage_seconds Duración de cada etapa del bucle de entrenamiento",
+                 "# TYPE tractor_stage_seconds histogram"]
+        for stage, i in self._index.items():
+            cumulative = np.cumsum(self._counts[i])
+            for edge, count in zip(self._edges, cumulative):
+                lines.append(f'tractor_stage_seconds_bucket{{stage="{stage}",le="{edge:.6g}"}} {count}')
+            lines.append(f'tractor_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {cumulative[-1]}')
+            lines.append(f'tractor_stage_seconds_sum{{stage="{stage}"}} {self._sums[i]:.9f}')
+            lines.append(f'tractor_stage_seconds_count{{stage="{stage}"}} {cumulative[-1]}')
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        self.flush()
+
+
+class NullProfiler:
+    """Sustituto sin coste cuando la instrumentación está desactivada"""
+
+    recording = False
+
+    def tick(self):
+        pass
+
+    def start(self):
+        return None
+
+    def stop(self, stage, start):
+        pass
+
+    def summary(self):
+        return {}
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def _format_for(path):
+    if path.endswith(".csv"):
+        return "csv"
+    if path.endswith(".jsonl"):
+        return "jsonl"
+    return "prom"
@@ -0,0 +1,177 @@
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import time
+
+import numpy as np
+
+from tractor_env import VecTractorEnv, endpoints_for_ports
+
+PROJECT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tractor-ia')
+
+
+class GodotLauncher:
+    """Arranca instancias de Godot sin pantalla para entrenar más rápido que en tiempo real
+
+    Cada instancia se lanza con `--headless` (renderizado desactivado) y
+    `--fixed-fps`, que desacopla el bucle del reloj de pared: Godot avanza
+    tan rápido como le permita la CPU. Tras `--` se pasan al proyecto el
+    puerto, `--fast` (sin decoraciones ni mallas por celda), el
+    `Engine.time_scale` y los ticks de física por segundo.
+    """
+
+    def __init__(self, ports=(8765,), godot=None, project=PROJECT_PATH, headless=True, fast=True,
+                 time_scale=1.0, physics_fps=60, fixed_fps=None, log_dir=None):
+        self.ports = list(ports)
+        self.godot = godot or os.environ.get('GODOT_BIN') or shutil.which('godot') or 'godot'
+        self.project = os.path.abspath(project)
+        self.headless = headless
+        self.fast = fast
+        self.time_scale = time_scale
+        self.physics_fps = physics_fps
+        # Un frame por tick de física: la simulación no espera al reloj de pared
+        self.fixed_fps = fixed_fps if fixed_fps is not None else physics_fps
+        self.log_dir = log_dir
+        self.processes = []
+        self._logs = []
+
+    @property
+    def endpoints(self):
+        return endpoints_for_ports(self.ports)
+
+    def command(self, port):
+        cmd = [self.godot, '--path', self.project]
+        if self.headless:
+            cmd.append('--headless')
+        if self.fixed_fps:
+            cmd += ['--fixed-fps', str(self.fixed_fps)]
+        cmd += ['--', f'--port={port}', f'--time-scale={self.time_scale}', f'--physics-fps={self.physics_fps}']
+        if self.fast:
+            cmd.append('--fast')
+        return cmd
+
+    def start(self):
+        for port in self.ports:
+            if self.log_dir:
+                os.makedirs(self.log_dir, exist_ok=True)
+                output = open(os.path.join(self.log_dir, f'godot_{port}.log'), 'w')
+                self._logs.append(output)
+            else:
+                output = subprocess.DEVNULL
+            self.processes.append(subprocess.Popen(self.command(port), stdout=output, stderr=subprocess.STDOUT))
+        print(f"🚀 {len(self.ports)} instancias de Godot lanzadas (puertos {', '.join(map(str, self.ports))})")
+
+    async def wait_ready(self, timeout=60):
+        """Espera a que todas las instancias acepten conexiones websocket"""
+        deadline = time.monotonic() + timeout
+        for uri in self.endpoints:
+            while True:
+                try:
+                    env = VecTractorEnv([uri], protocol='json')
+                    await env.connect()
+                    await env.close()
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"Godot no responde en {uri}")
+                    await asyncio.sleep(0.5)
+        print("✅ Instancias de Godot listas")
+
+    def stop(self):
+        for proc in self.processes:
+            proc.terminate()
+        for proc in self.processes:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        self.processes.clear()
+        for log in self._logs:
+            log.close()
+        self._logs.clear()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+async def measure_throughput(endpoints, seconds=10.0, repeat=1, physics_fps=60, time_scale=1.0, protocol='auto',
+                             seed=0):
+    """Avanza las instancias con acciones aleatorias en lockstep y mide el ritmo de simulación
+
+    Devuelve pasos del agente por segundo, ticks de física simulados por
+    segundo de reloj y segundos simulados por segundo de reloj (el factor
+    sobre tiempo real). `Engine.time_scale` no cambia el número de ticks
+    sino el delta de cada uno, así que cada tick simula
+    time_scale / physics_fps segundos.
+    """
+    rng = np.random.default_rng(seed)
+    env = VecTractorEnv(endpoints, protocol=protocol, lockstep=True, repeat=repeat)
+    await env.connect()
+    try:
+        await env.reset()
+        steps = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            actions = np.column_stack([rng.uniform(0.5, 1.0, len(env)), rng.uniform(-0.8, 0.8, len(env)),
+                                       np.zeros(len(env))])
+            _, _, dones, _ = await env.step(actions)
+            steps += len(env)
+            if dones.any():
+                await env.reset(np.flatnonzero(dones))
+        elapsed = time.perf_counter() - start
+    finally:
+        await env.close()
+
+    ticks_per_sec = steps * repeat / elapsed
+    sim_seconds_per_sec = ticks_per_sec * time_scale / physics_fps
+    result = {
+        "agent_steps_per_sec": steps / elapsed,
+        "sim_ticks_per_sec": ticks_per_sec,
+        "sim_seconds_per_sec": sim_seconds_per_sec,
+        "realtime_factor": sim_seconds_per_sec,
+    }
+    print(f"📈 Rendimiento ({len(env)} instancias, {elapsed:.1f} s):")
+    print(f"   ├─ Pasos del agente/seg: {result['agent_steps_per_sec']:.1f}")
+    print(f"   ├─ Ticks simulados/seg de reloj: {result['sim_ticks_per_sec']:.1f}")
+    print(f"   └─ Segundos simulados/seg de reloj: {result['sim_seconds_per_sec']:.1f}x tiempo real "
+          f"(time_scale {time_scale:g})")
+    return result
+
+
+async def main(args):
+    ports = list(range(args.base_port, args.base_port + args.instances))
+    launcher = GodotLauncher(ports, godot=args.godot, headless=not args.window, fast=not args.full_scene,
+                             time_scale=args.time_scale, physics_fps=args.physics_fps, log_dir=args.log_dir)
+    with launcher:
+        await launcher.wait_ready()
+        await measure_throughput(launcher.endpoints, seconds=args.seconds, repeat=args.repeat,
+                                 physics_fps=args.physics_fps, time_scale=args.time_scale)
+        if args.train:
+            from train_tractor import train_agent
+            await train_agent(max_episodes=args.train, endpoints=launcher.endpoints, lockstep=True, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lanza Godot sin pantalla y mide/entrena más rápido que tiempo real")
+    parser.add_argument("--instances", type=int, default=1, help="Número de instancias de Godot")
+    parser.add_argument("--base-port", type=int, default=8765)
+    parser.add_argument("--godot", default=None, help="Ejecutable de Godot (por defecto $GODOT_BIN o 'godot')")
+    parser.add_argument("--time-scale", type=float, default=1.0)
+    parser.add_argument("--physics-fps", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=1, help="Ticks de física por acción")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duración de la medición")
+    parser.add_argument("--train", type=int, default=0, help="Episodios a entrenar tras medir (0 = solo medir)")
+    parser.add_argument("--window", action="store_true", help="Mostrar ventana (sin --headless)")
+    parser.add_argument("--full-scene", action="store_true", help="No saltar decoraciones ni mallas por celda")
+    parser.add_argument("--log-dir", default=None, help="Directorio para la salida de cada instancia")
+
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        print("\n🛑 Lanzador detenido manualmente")
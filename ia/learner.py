@@ -0,0 +1,232 @@
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from replay_buffer import ACTION_DIM, OBS_DIM, ReplayBuffer
+
+
+def _get_context():
+    # spawn: el learner arranca su propio runtime de TensorFlow en vez de heredar el del actor
+    return multiprocessing.get_context("spawn")
+
+
+class _SharedArrays:
+    """Arrays NumPy sobre bloques de multiprocessing.shared_memory que se pueden enviar a otro proceso"""
+
+    def __init__(self):
+        self.segments = {}
+        self.arrays = {}
+        self.owner = True
+
+    def create(self, name, shape, dtype):
+        nbytes = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        array.fill(0)
+        self.segments[name] = (shm, shape, np.dtype(dtype).str)
+        self.arrays[name] = array
+        return array
+
+    def __getstate__(self):
+        return {name: (shm.name, shape, dtype) for name, (shm, shape, dtype) in self.segments.items()}
+
+    def __setstate__(self, state):
+        self.segments = {}
+        self.arrays = {}
+        self.owner = False
+        for name, (shm_name, shape, dtype) in state.items():
+            shm = shared_memory.SharedMemory(name=shm_name)
+            self.segments[name] = (shm, shape, dtype)
+            self.arrays[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+    def close(self):
+        """Libera las vistas; el proceso que creó los bloques además los elimina"""
+        self.arrays.clear()
+        for shm, _, _ in self.segments.values():
+            shm.close()
+            if self.owner:
+                shm.unlink()
+        self.segments.clear()
+
+
+class SharedReplayBuffer(ReplayBuffer):
+    """ReplayBuffer cuyos arrays y punteros viven en memoria compartida
+
+    El actor inserta y el learner muestrea desde otro proceso sin copias
+    ni colas: ambos ven los mismos bloques. Un lock protege puntero y
+    tamaño para que el learner nunca lea un lote a medio escribir.
+    """
+
+    def __init__(self, capacity=1_000_000, obs_dim=OBS_DIM, action_dim=ACTION_DIM, seed=None, ctx=None):
+        ctx = ctx or _get_context()
+        self._shared = _SharedArrays()
+        self._lock = ctx.Lock()
+        super().__init__(capacity, obs_dim, action_dim, path=None, seed=seed)
+
+    def _allocate(self, shapes):
+        self._counters = self._shared.create("counters", (2,), np.int64)
+        return {name: self._shared.create(name, shape, np.float32) for name, shape in shapes.items()}
+
+    def add(self, obs, action, reward, next_obs, done):
+        with self._lock:
+            return super().add(obs, action, reward, next_obs, done)
+
+    def add_batch(self, obs, action, reward, next_obs, done):
+        with self._lock:
+            return super().add_batch(obs, action, reward, next_obs, done)
+
+    def sample(self, batch_size):
+        with self._lock:
+            return super().sample(batch_size)
+
+    def snapshot(self):
+        with self._lock:
+            return super().snapshot()
+
+    def __getstate__(self):
+        return {"capacity": self.capacity, "shared": self._shared, "lock": self._lock}
+
+    def __setstate__(self, state):
+        self.capacity = state["capacity"]
+        self.path = None
+        self.rng = np.random.default_rng()
+        self._shared = state["shared"]
+        self._lock = state["lock"]
+        arrays = self._shared.arrays
+        self._counters = arrays["counters"]
+        self.obs = arrays["obs"]
+        self.action = arrays["action"]
+        self.reward = arrays["reward"]
+        self.next_obs = arrays["next_obs"]
+        self.done = arrays["done"]
+
+    def close(self):
+        self._shared.close()
+
+
+class WeightBroadcast:
+    """Canal de pesos del learner a los actores
+
+    Los pesos se publican aplanados en un bloque compartido junto con un
+    número de versión; cada actor solo copia cuando la versión cambia.
+    """
+
+    def __init__(self, weights, ctx=None):
+        ctx = ctx or _get_context()
+        self.shapes = [np.shape(w) for w in weights]
+        total = sum(int(np.prod(shape)) for shape in self.shapes)
+        self._shared = _SharedArrays()
+        self._flat = self._shared.create("weights", (total,), np.float32)
+        self._version = ctx.Value("q", 0)
+        self._lock = ctx.Lock()
+        self.publish(weights)
+        self.seen = self._version.value  # El creador ya tiene estos pesos
+
+    def publish(self, weights):
+        flat = np.concatenate([np.ravel(w) for w in weights]).astype(np.float32)
+        with self._lock:
+            self._flat[:] = flat
+            self._version.value += 1
+
+    def poll(self):
+        """Devuelve la lista de pesos si hay una versión nueva, o None"""
+        if self._version.value == self.seen:
+            return None
+        with self._lock:
+            flat = self._flat.copy()
+            self.seen = self._version.value
+
+        weights, offset = [], 0
+        for shape in self.shapes:
+            size = int(np.prod(shape))
+            weights.append(flat[offset:offset + size].reshape(shape))
+            offset += size
+        return weights
+
+    def __getstate__(self):
+        return {"shapes": self.shapes, "shared": self._shared, "version": self._version, "lock": self._lock}
+
+    def __setstate__(self, state):
+        self.shapes = state["shapes"]
+        self._shared = state["shared"]
+        self._flat = self._shared.arrays["weights"]
+        self._version = state["version"]
+        self._lock = state["lock"]
+        self.seen = 0
+
+    def close(self):
+        self._shared.close()
+
+
+def run_learner(memory, broadcast, updates, stop_event, sync_every, agent_options):
+    """Bucle del proceso learner: entrena sin pausa y publica pesos cada `sync_every` pasos
+
+    `agent_options` (target_update, double_dqn...) se pasan tal cual a
+    TractorAgent: es el learner quien calcula los objetivos del replay.
+    """
+    from train_tractor import TractorAgent
+
+    agent = TractorAgent(memory=memory, **agent_options)
+    agent.set_weights(broadcast.poll())
+
+    while not stop_event.is_set():
+        if len(memory) < agent.batch_size:
+            time.sleep(0.01)
+            continue
+        agent.replay()
+        with updates.get_lock():
+            updates.value += 1
+            n = updates.value
+        if n % sync_every == 0:
+            broadcast.publish(agent.model.get_weights())
+
+    broadcast.publish(agent.model.get_weights())
+
+
+class Learner:
+    """Learner en un proceso separado que entrena sobre la memoria compartida
+
+    El actor solo hace inferencia y guarda transiciones; cada `sync_every`
+    actualizaciones el learner publica pesos nuevos que el actor recoge con
+    `sync(agent)` sin bloquear el bucle del websocket. La configuración de
+    la red objetivo se aplica al agente del learner, que es el que entrena.
+    """
+
+    def __init__(self, weights, memory, sync_every=50, target_update='hard', target_sync_every=100, tau=0.005,
+                 double_dqn=True, ctx=None):
+        ctx = ctx or _get_context()
+        self.memory = memory
+        self.broadcast = WeightBroadcast(weights, ctx)
+        self.updates = ctx.Value("q", 0)
+        self.stop_event = ctx.Event()
+        self.process = ctx.Process(
+            target=run_learner,
+            args=(memory, self.broadcast, self.updates, self.stop_event, sync_every,
+                  dict(target_update=target_update, target_sync_every=target_sync_every, tau=tau,
+                       double_dqn=double_dqn)),
+            daemon=True,
+        )
+
+    def start(self):
+        self.process.start()
+
+    def sync(self, target):
+        """Copia en `target` (agente o modelo) los últimos pesos publicados; True si había pesos nuevos"""
+        weights = self.broadcast.poll()
+        if weights is None:
+            return False
+        target.set_weights(weights)
+        return True
+
+    def stop(self, timeout=30):
+        """Detiene el learner y espera a que publique los pesos finales"""
+        self.stop_event.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+
+    def close(self):
+        self.broadcast.close()
+        self.memory.close()
@@ -0,0 +1,320 @@
+import argparse
+import glob
+import math
+import os
+
+import numpy as np
+
+from npy_chunks import chunk_file, write_chunk
+from npy_chunks import read_chunks as _read_chunks
+
+# Columnas del historial: una fila por episodio
+COLUMNS = {
+    "reward": np.float32,
+    "length": np.int32,
+    "epsilon": np.float32,
+    "progress": np.float32,
+}
+
+
+class RunningStats:
+    """Media, desviación, mínimo y máximo en línea (Welford) sin guardar la serie"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.argmax = -1
+
+    def update(self, value, index):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        if value > self.max:
+            self.max = value
+            self.argmax = index
+
+    def update_batch(self, values, first_index):
+        """Combina un bloque entero de valores (fórmula de Chan para varianzas paralelas)"""
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        n, mean = len(values), float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = self.count + n
+        delta = mean - self.mean
+        self._m2 += m2 + delta ** 2 * self.count * n / total
+        self.mean += delta * n / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        best = int(values.argmax())
+        if values[best] > self.max:
+            self.max = float(values[best])
+            self.argmax = first_index + best
+
+    @property
+    def std(self):
+        return math.sqrt(self._m2 / self.count) if self.count else 0.0
+
+
+class MetricsLog:
+    """Historial de episodios con memoria constante
+
+    Las filas se acumulan en un bloque de `chunk_size` episodios; cada bloque
+    lleno se escribe como un `.npy` por columna (`reward_000000.npy`, ...) y
+    no se vuelve a tocar. `flush()` escribe también el bloque a medias, así
+    que un fallo pierde como mucho lo ocurrido desde el último volcado. Las
+    estadísticas globales se mantienen en línea y los últimos `window`
+    valores en un anillo para las medias recientes. Sin `path` los bloques
+    se guardan en memoria, como hacían las listas originales.
+    """
+
+    def __init__(self, path=None, chunk_size=4096, window=100):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.window = window
+        self._reset()
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._recover()
+
+    def _reset(self):
+        chunk_size, window = self.chunk_size, self.window
+        self.count = 0
+        self.stats = {column: RunningStats() for column in COLUMNS}
+        self._recent = {column: np.zeros(window, dtype=dtype) for column, dtype in COLUMNS.items()}
+        self._buffer = {column: np.zeros(chunk_size, dtype=dtype) for column, dtype in COLUMNS.items()}
+        self._fill = 0
+        self._chunk = 0
+        self._memory_chunks = []
+
+    def __len__(self):
+        return self.count
+
+    def _recover(self):
+        """Reconstruye estadísticas y bloque actual a partir de los ficheros existentes"""
+        for k, chunk in enumerate(read_chunks(self.path)):
+            self._absorb(chunk)
+            if len(chunk["reward"]) < self.chunk_size:
+                for column in COLUMNS:
+                    self._buffer[column][:len(chunk[column])] = chunk[column]
+                self._fill = len(chunk["reward"])
+                self._chunk = k
+                return
+            self._chunk = k + 1
+
+    def _absorb(self, chunk):
+        n = len(chunk["reward"])
+        for column in COLUMNS:
+            self.stats[column].update_batch(chunk[column], self.count)
+            positions = (self.count + np.arange(max(0, n - self.window), n)) % self.window
+            self._recent[column][positions] = chunk[column][-len(positions):] if len(positions) else []
+        self.count += n
+
+    def append(self, reward, length, epsilon, progress):
+        """Añade un episodio terminado"""
+        i = self._fill
+        slot = self.count % self.window
+        for column, value in zip(COLUMNS, (reward, length, epsilon, progress)):
+            self._buffer[column][i] = value
+            self._recent[column][slot] = value
+            self.stats[column].update(float(value), self.count)
+        self.count += 1
+        self._fill += 1
+        if self._fill == self.chunk_size:
+            self._write_chunk()
+            self._chunk += 1
+            self._fill = 0
+
+    def truncate(self, count):
+        """Descarta los episodios a partir de `count` (al reanudar desde un checkpoint anterior)"""
+        if count >= self.count:
+            return
+        if not self.path:
+            kept = list(self.iter_chunks())
+            self._reset()
+            for chunk in kept:
+                for row in zip(*(chunk[column][:count - self.count] for column in COLUMNS)):
+                    self.append(*row)
+            return
+
+        self.flush()
+        k, rest = divmod(count, self.chunk_size)
+        if rest:
+            head = {column: np.array(values[:rest]) for column, values in next(
+                chunk for i, chunk in enumerate(read_chunks(self.path)) if i == k).items()}
+            write_chunk(self.path, k, head)
+            k += 1
+        while os.path.exists(chunk_file(self.path, "reward", k)):
+            for column in COLUMNS:
+                os.remove(chunk_file(self.path, column, k))
+            k += 1
+        self._reset()
+        self._recover()
+
+    def recent_mean(self, column, n=10):
+        """Media de los últimos `n` episodios (n ≤ window)"""
+        n = min(n, self.count, self.window)
+        if n == 0:
+            return 0.0
+        positions = (self.count - 1 - np.arange(n)) % self.window
+        return float(self._recent[column][positions].mean())
+
+    def _write_chunk(self):
+        chunk = {column: self._buffer[column][:self._fill].copy() for column in COLUMNS}
+        if not self.path:
+            if self._fill == self.chunk_size:
+                self._memory_chunks.append(chunk)
+            return
+        write_chunk(self.path, self._chunk, chunk)
+
+    def flush(self):
+        """Escribe el bloque a medias para no perderlo si el proceso cae"""
+        if self.path and self._fill:
+            self._write_chunk()
+
+    def iter_chunks(self):
+        """Recorre el historial bloque a bloque (columnas → arrays)"""
+        if self.path:
+            for k, chunk in enumerate(read_chunks(self.path)):
+                if k == self._chunk:
+                    break
+                yield chunk
+        else:
+            yield from self._memory_chunks
+        if self._fill:
+            yield {column: self._buffer[column][:self._fill] for column in COLUMNS}
+
+
+def read_chunks(path):
+    """Lee un historial en disco bloque a bloque sin cargarlo entero (memmap de solo lectura)
+
+    Sirve también mientras el entrenamiento sigue escribiendo en `path`.
+    """
+    return _read_chunks(path, COLUMNS)
+
+
+def count_episodes(path):
+    return sum(len(chunk["reward"]) for chunk in read_chunks(path))
+
+
+def downsample(chunks, n, max_points=2000, window=20):
+    """Medias por tramos de cada columna y del promedio móvil de recompensa, en una pasada
+
+    Devuelve (x, {columna: medias}, medias del promedio móvil). La memoria es
+    O(max_points) sea cual sea el número de episodios.
+    """
+    bin_size = max(1, math.ceil(n / max_points))
+    n_bins = math.ceil(n / bin_size)
+    sums = {column: np.zeros(n_bins) for column in COLUMNS}
+    counts = np.zeros(n_bins)
+    avg_sums = np.zeros(n_bins)
+    avg_counts = np.zeros(n_bins)
+    kernel = np.ones(window) / window
+    tail = np.empty(0)
+    offset = 0
+    for chunk in chunks:
+        m = min(len(chunk["reward"]), n - offset)
+        if m <= 0:
+            break
+        bins = (offset + np.arange(m)) // bin_size
+        counts += np.bincount(bins, minlength=n_bins)
+        for column in COLUMNS:
+            sums[column] += np.bincount(bins, weights=chunk[column][:m], minlength=n_bins)
+
+        # Promedio móvil continuo entre bloques: se arrastran los últimos window-1 valores
+        series = np.concatenate([tail, chunk["reward"][:m]])
+        if len(series) >= window:
+            moving = np.convolve(series, kernel, mode="valid")
+            ends = offset - len(tail) + window - 1 + np.arange(len(moving))
+            avg_sums += np.bincount(ends // bin_size, weights=moving, minlength=n_bins)
+            avg_counts += np.bincount(ends // bin_size, minlength=n_bins)
+        tail = series[len(series) - (window - 1):] if window > 1 else np.empty(0)
+        offset += m
+
+    x = np.arange(n_bins) * bin_size + (bin_size - 1) / 2
+    means = {column: sums[column] / np.maximum(counts, 1) for column in COLUMNS}
+    moving_avg = np.where(avg_counts > 0, avg_sums / np.maximum(avg_counts, 1), np.nan)
+    return x, means, moving_avg
+
+
+def plot_metrics(source, filename='training_progress.png', dpi=300, max_points=2000):
+    """Genera las gráficas de entrenamiento desde un MetricsLog o desde un directorio de historial"""
+    import matplotlib.pyplot as plt
+
+    if isinstance(source, MetricsLog):
+        n, chunks = source.count, source.iter_chunks()
+    else:
+        n, chunks = count_episodes(source), read_chunks(source)
+    if n == 0:
+        print("📊 Sin episodios que graficar todavía")
+        return
+
+    window = min(20, n)
+    x, means, moving_avg = downsample(chunks, n, max_points, window)
+
+    fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 10))
+
+    # Gráfica 1: Recompensas por episodio
+    ax1.plot(x, means["reward"], 'b-', alpha=0.7)
+    ax1.set_title('Recompensas por Episodio')
+    ax1.set_xlabel('Episodio')
+    ax1.set_ylabel('Recompensa Total')
+    ax1.grid(True, alpha=0.3)
+
+    # Promedio móvil de recompensas
+    if n > 10:
+        ax1.plot(x, moving_avg, 'r-', linewidth=2, label='Promedio Móvil')
+        ax1.legend()
+
+    # Gráfica 2: Epsilon (exploración) vs tiempo
+    ax2.plot(x, means["epsilon"], 'g-')
+    ax2.set_title('Decaimiento de Epsilon (Exploración)')
+    ax2.set_xlabel('Episodio')
+    ax2.set_ylabel('Epsilon')
+    ax2.grid(True, alpha=0.3)
+
+    # Gráfica 3: Duración de episodios
+    ax3.plot(x, means["length"], 'purple', alpha=0.7)
+    ax3.set_title('Duración de Episodios')
+    ax3.set_xlabel('Episodio')
+    ax3.set_ylabel('Pasos')
+    ax3.grid(True, alpha=0.3)
+
+    # Gráfica 4: Progreso máximo por episodio
+    ax4.plot(x, means["progress"], 'orange')
+    ax4.set_title('Progreso Máximo por Episodio (%)')
+    ax4.set_xlabel('Episodio')
+    ax4.set_ylabel('Progreso (%)')
+    ax4.grid(True, alpha=0.3)
+
+    if len(x) < n:
+        fig.suptitle(f'{n} episodios (media cada {math.ceil(n / max_points)} episodios)')
+    plt.tight_layout()
+    plt.savefig(filename, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    print(f"📊 Gráficas guardadas como '{filename}'")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resumen y gráficas de un historial de entrenamiento")
+    parser.add_argument("path", help="Directorio del historial (se puede leer mientras se entrena)")
+    parser.add_argument("--out", default="training_progress.png")
+    parser.add_argument("--dpi", type=int, default=150)
+    parser.add_argument("--max-points", type=int, default=2000)
+    args = parser.parse_args()
+
+    stats = {column: RunningStats() for column in COLUMNS}
+    offset = 0
+    for chunk in read_chunks(args.path):
+        for column in COLUMNS:
+            stats[column].update_batch(chunk[column], offset)
+        offset += len(chunk["reward"])
+    print(f"📈 {offset} episodios en {args.path} ({len(glob.glob(os.path.join(args.path, 'reward_*.npy')))} bloques)")
+    for column, s in stats.items():
+        print(f"   ├─ {column}: media {s.mean:.2f} ± {s.std:.2f} | mín {s.min:.2f} | máx {s.max:.2f}")
+    plot_metrics(args.path, args.out, dpi=args.dpi, max_points=args.max_points)
@@ -0,0 +1,44 @@
+import os
+
+import numpy as np
+
+
+def chunk_file(path, column, k):
+    """Fichero de la columna `column` del bloque `k`: `reward_000000.npy`, ..."""
+    return os.path.join(path, f"{column}_{k:06d}.npy")
+
+
+def count_chunks(path, column):
+    """Bloques escritos en `path`, contando los ficheros consecutivos de `column`"""
+    k = 0
+    while os.path.exists(chunk_file(path, column, k)):
+        k += 1
+    return k
+
+
+def write_chunk(path, k, chunk):
+    """Escribe el bloque `k` ({columna: array}) como un `.npy` por columna
+
+    Escritura atómica: un lector nunca ve un .npy a medio escribir.
+    """
+    for column, values in chunk.items():
+        target = chunk_file(path, column, k)
+        with open(target + ".tmp", "wb") as f:
+            np.save(f, values)
+        os.replace(target + ".tmp", target)
+
+
+def read_chunks(path, columns):
+    """Lee los bloques de `path` uno a uno sin cargarlos (memmap de solo lectura)
+
+    Sirve también mientras otro proceso sigue escribiendo en `path`.
+    """
+    columns = list(columns)
+    for k in range(count_chunks(path, columns[0])):
+        try:
+            chunk = {column: np.load(chunk_file(path, column, k), mmap_mode="r") for column in columns}
+        except (OSError, ValueError):
+            return
+        # Tras una caída a mitad de volcado las columnas pueden tener longitudes distintas
+        n = min(len(values) for values in chunk.values())
+        yield {column: values[:n] for column, values in chunk.items()}
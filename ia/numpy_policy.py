@@ -0,0 +1,99 @@
+import json
+
+import numpy as np
+
+ACTIVATIONS = {
+    "relu": lambda x: np.maximum(x, 0.0, out=x),
+    "linear": lambda x: x,
+    "tanh": np.tanh,
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+}
+
+
+class NumpyPolicy:
+    """Pase hacia delante de la red densa (7-24-24-3) con NumPy puro
+
+    Para una red tan pequeña `model.predict` gasta casi todo su tiempo en
+    la maquinaria de Keras; aquí son tres productos de matrices y ReLU.
+    Los pesos se extraen del modelo de Keras o directamente del `.h5`.
+    """
+
+    def __init__(self, layers):
+        # layers: lista de (kernel, bias, nombre de activación)
+        self.activations = [activation for _, _, activation in layers]
+        for activation in self.activations:
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Activación no soportada: {activation}")
+        self.set_weights([w for kernel, bias, _ in layers for w in (kernel, bias)])
+
+    @classmethod
+    def from_model(cls, model):
+        """Copia los pesos de las capas Dense de un modelo de Keras"""
+        layers = []
+        for layer in model.layers:
+            kernel, bias = layer.get_weights()
+            layers.append((kernel, bias, layer.get_config()["activation"]))
+        return cls(layers)
+
+    @classmethod
+    def from_h5(cls, path):
+        """Lee pesos y activaciones del `.h5` guardado por Keras, sin importar Keras"""
+        import h5py
+
+        with h5py.File(path, "r") as f:
+            config = json.loads(f.attrs["model_config"])
+            activations = [layer["config"]["activation"] for layer in config["config"]["layers"]
+                           if layer["class_name"] == "Dense"]
+            group = f["model_weights"] if "model_weights" in f else f
+            weights = []
+            for name in group.attrs["layer_names"]:
+                layer = group[_decode(name)]
+                weights.extend(np.array(layer[_decode(w)]) for w in layer.attrs["weight_names"])
+
+        kernels, biases = weights[0::2], weights[1::2]
+        return cls(list(zip(kernels, biases, activations)))
+
+    @classmethod
+    def from_npz(cls, path):
+        """Carga la exportación compacta escrita por `save_npz`"""
+        with np.load(path) as data:
+            activations = [str(a) for a in data["activations"]]
+            layers = [(data[f"kernel_{i}"], data[f"bias_{i}"], activation)
+                      for i, activation in enumerate(activations)]
+        return cls(layers)
+
+    @classmethod
+    def load(cls, path):
+        """Carga un `.npz` exportado o un `.h5` de Keras según la extensión"""
+        if str(path).endswith(".npz"):
+            return cls.from_npz(path)
+        return cls.from_h5(path)
+
+    def save_npz(self, path):
+        """Exporta pesos y activaciones a un `.npz` que se carga sin Keras ni h5py"""
+        arrays = {"activations": np.array(self.activations)}
+        for i, (kernel, bias) in enumerate(zip(self.kernels, self.biases)):
+            arrays[f"kernel_{i}"] = kernel
+            arrays[f"bias_{i}"] = bias
+        np.savez(path, **arrays)
+
+    def set_weights(self, weights):
+        """Actualiza los pesos con la lista plana [kernel, bias, ...] de `model.get_weights()`"""
+        weights = [np.asarray(w, dtype=np.float32) for w in weights]
+        self.kernels = weights[0::2]
+        self.biases = weights[1::2]
+        self.input_dim = self.kernels[0].shape[0]
+
+    def get_weights(self):
+        return [w for pair in zip(self.kernels, self.biases) for w in pair]
+
+    def predict(self, x):
+        """Devuelve las salidas de la red para un lote (N, input_dim) o una sola fila"""
+        x = np.asarray(x, dtype=np.float32).reshape(-1, self.input_dim)
+        for kernel, bias, activation in zip(self.kernels, self.biases, self.activations):
+            x = ACTIVATIONS[activation](x @ kernel + bias)
+        return x
+
+
+def _decode(name):
+    return name.decode("utf8") if isinstance(name, bytes) else name
@@ -0,0 +1,326 @@
+import argparse
+import asyncio
+import copy
+import itertools
+import json
+import time
+
+import numpy as np
+import websockets
+
+from instrumentation import NULL_PROFILER, Profiler
+from protocol import CODECS, handshake_message
+from test_model import TractorTester
+from tractor_env import WS_CONFIG, TractorEnv, endpoints_for_ports
+
+
+class MicroBatcher:
+    """Agrupa las observaciones de muchos clientes en un solo pase de la red
+
+    La primera observación pendiente arranca un temporizador de `max_delay`
+    segundos; al vencer, al juntarse `max_batch` observaciones o en cuanto
+    todos los clientes activos (`set_active`) tienen una pendiente, se apilan
+    todas, se hace una única predicción y cada cliente recibe su fila. Todo
+    ocurre en el bucle de eventos: con una red de 7-24-24-3 el pase dura
+    decenas de microsegundos y no compensa un hilo aparte.
+    """
+
+    def __init__(self, predict, max_batch=64, max_delay=0.002, profiler=None):
+        self.predict = predict
+        self.max_batch = max(1, int(max_batch))
+        self.max_delay = max_delay
+        self.profiler = profiler or NULL_PROFILER
+        self._pending = []
+        self._timer = None
+        self.active_clients = 0
+        self.batches = 0
+        self.actions = 0
+        self.largest_batch = 0
+
+    async def submit(self, obs):
+        """Encola una observación (7,) y espera la salida de la red para ella"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((obs, future))
+        if self._full():
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush)
+        return await future
+
+    def set_active(self, clients):
+        """Número de clientes conectados: con todos esperando no tiene sentido esperar más"""
+        self.active_clients = clients
+        if self._pending and self._full():
+            self._flush()
+
+    def _full(self):
+        # Sin recuento de clientes (uso suelto) solo cuenta max_batch
+        limit = min(self.max_batch, self.active_clients) if self.active_clients else self.max_batch
+        return len(self._pending) >= limit
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        t = self.profiler.start()
+        try:
+            outputs = self.predict(np.stack([obs for obs, _ in batch]))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.profiler.stop('forward', t)
+
+        for (_, future), output in zip(batch, outputs):
+            # Un cliente que se ha desconectado mientras esperaba ya tiene el future cancelado
+            if not future.done():
+                future.set_result(output)
+        self.batches += 1
+        self.actions += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+    @property
+    def mean_batch(self):
+        return self.actions / self.batches if self.batches else 0.0
+
+
+class LatencyWindow:
+    """Últimas `size` latencias en crudo, para percentiles exactos
+
+    El histograma del Profiler tiene 4 cubetas por década y solo puede
+    dar 1.0, 1.78, 3.16... ms: demasiado grueso para ver lo que cuesta
+    una ventana de agrupación de 2 ms. Aquí se guarda un anillo fijo de
+    muestras y los percentiles se calculan sobre él al pedir el resumen.
+    """
+
+    def __init__(self, size=4096):
+        self.samples = np.zeros(size)
+        self.count = 0
+
+    def add(self, seconds):
+        self.samples[self.count % len(self.samples)] = seconds
+        self.count += 1
+
+    def summary(self):
+        """count (total), mean, p50 y p99 en segundos de las últimas `size` muestras"""
+        if not self.count:
+            return {}
+        window = self.samples[:min(self.count, len(self.samples))]
+        p50, p99 = np.percentile(window, [50, 99])
+        return {"count": self.count, "mean": float(window.mean()), "p50": float(p50), "p99": float(p99)}
+
+
+class _Client:
+    """Estado de un tractor conectado: su copia del tester (giros propios) y sus latencias"""
+
+    def __init__(self, name, tester):
+        self.name = name
+        # Copia ligera: comparte la política pero no el estado de giros consecutivos
+        self.tester = copy.copy(tester)
+        self.latency = LatencyWindow()
+        self.actions = 0
+        self.connected = time.monotonic()
+
+
+class PolicyServer:
+    """Una sola política atendiendo a una flota de tractores con micro-batching
+
+    `serve()` acepta conexiones de tractores que envían estados (JSON o
+    binario, igual que los emite Godot) y responden con acciones; `drive()`
+    se conecta en cambio a instancias de Godot o de sim_env.py, que son las
+    que escuchan. En ambos casos cada tractor avanza a su ritmo, sin
+    esperar al resto como VecTractorEnv, y solo se agrupan las predicciones.
+
+    Cada `report_interval` segundos se imprimen las acciones/seg agregadas,
+    el tamaño medio de lote y la latencia p50/p99 por cliente (desde que
+    llega el estado hasta que la acción está lista), calculada sobre las
+    últimas muestras en crudo (LatencyWindow). Con `metrics_path` los
+    histogramas agregados se vuelcan además con el Profiler.
+    """
+
+    def __init__(self, tester, max_batch=64, max_delay=0.002, metrics_path=None, report_interval=10.0):
+        self.tester = tester
+        self.profiler = Profiler(metrics_path, flush_interval=report_interval)
+        self.latency = LatencyWindow(16384)
+        self.batcher = None
+        if tester.policy is not None:
+            self.batcher = MicroBatcher(tester.policy.predict, max_batch, max_delay, self.profiler)
+        self.report_interval = report_interval
+        self.clients = {}
+        self._finished_actions = 0
+        self._ids = itertools.count(1)
+        self._started = time.monotonic()
+        self._last_report = (self._started, 0)
+
+    @property
+    def actions(self):
+        """Acciones servidas en total, incluidas las de clientes ya desconectados"""
+        return sum(client.actions for client in self.clients.values()) + self._finished_actions
+
+    def _register(self, uri=None):
+        # Numerado siempre: varias conexiones pueden ir a la misma URI
+        name = f"cliente_{next(self._ids)}"
+        client = _Client(f"{name} ({uri})" if uri else name, self.tester)
+        self.clients[client.name] = client
+        if self.batcher is not None:
+            self.batcher.set_active(len(self.clients))
+        return client
+
+    def _unregister(self, client):
+        self.clients.pop(client.name, None)
+        self._finished_actions += client.actions
+        if self.batcher is not None:
+            self.batcher.set_active(len(self.clients))
+
+    async def act(self, client, obs, start):
+        """Acción para `obs` del cliente; `start` es el instante en que llegó el estado"""
+        if self.batcher is None:
+            # Sin modelo: comportamiento por defecto del tester, sin red que agrupar
+            action = client.tester.predict_action(obs)
+        else:
+            action = client.tester.adjust_action(await self.batcher.submit(np.asarray(obs, dtype=np.float32)))
+        elapsed = time.perf_counter() - start
+        client.latency.add(elapsed)
+        self.latency.add(elapsed)
+        self.profiler.stop('latency', start)
+        client.actions += 1
+        return action
+
+    async def handle(self, ws):
+        """Atiende a un tractor que se conecta: por cada estado recibido responde una acción"""
+        client = self._register()
+        codec = CODECS['json']
+        print(f"✅ {client.name} conectado ({len(self.clients)} activos)")
+        await ws.send(handshake_message(lockstep=False))
+        try:
+            async for message in ws:
+                start = time.perf_counter()
+                if isinstance(message, str) and '"protocol"' in message:
+                    codec = CODECS[json.loads(message)['protocol']]
+                    await ws.send(json.dumps({"protocol": codec.name, "lockstep": False}))
+                    continue
+                state = codec.decode_state(message)
+                if state is None:
+                    continue
+                obs, _, done, _, step_id, _ = state
+                action = await self.act(client, obs, start)
+                await ws.send(codec.encode_action(action, reset_episode=done, step_id=step_id))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._unregister(client)
+            print(f"🔌 {client.name} desconectado tras {client.actions} acciones")
+
+    async def drive(self, uri, protocol='auto'):
+        """Conduce el tractor de una instancia de Godot (o del simulador) hasta que se cierre"""
+        client = self._register(uri)
+        env = TractorEnv(uri, protocol)
+        try:
+            await env.connect()
+            print(f"✅ Conectado a {uri} ({env.codec.name})")
+            # Como en el entrenamiento: el primer estado llega tras pedir un episodio nuevo
+            obs, _, done, _ = await env.reset()
+            while True:
+                if done:
+                    obs, _, done, _ = await env.reset()
+                action = await self.act(client, obs, time.perf_counter())
+                obs, _, done, _ = await env.step(action)
+        except (websockets.ConnectionClosed, OSError) as e:
+            print(f"🔌 {uri}: {e}")
+        finally:
+            await env.close()
+            self._unregister(client)
+
+    def stats(self):
+        """Acciones/seg agregadas, tamaño de lote y latencias por cliente (en segundos)"""
+        elapsed = time.monotonic() - self._started
+        actions = self.actions
+        return {
+            "clients": len(self.clients),
+            "actions": actions,
+            "actions_per_sec": actions / elapsed if elapsed > 0 else 0.0,
+            "batches": self.batcher.batches if self.batcher else 0,
+            "mean_batch": self.batcher.mean_batch if self.batcher else 0.0,
+            "largest_batch": self.batcher.largest_batch if self.batcher else 0,
+            "latency": self.latency.summary(),
+            "per_client": {name: {"actions": client.actions, **client.latency.summary()}
+                           for name, client in self.clients.items()},
+        }
+
+    def report(self):
+        now = time.monotonic()
+        last_time, last_actions = self._last_report
+        actions = self.actions
+        rate = (actions - last_actions) / max(now - last_time, 1e-9)
+        self._last_report = (now, actions)
+        stats = self.stats()
+        print(f"📈 {stats['clients']} clientes | {rate:.0f} acciones/seg | lote medio {stats['mean_batch']:.1f} "
+              f"(máx {stats['largest_batch']})")
+        for name, client in stats["per_client"].items():
+            if client.get("count"):
+                print(f"   ├─ {name}: {client['actions']} acciones | p50 {client['p50'] * 1e3:.2f} ms "
+                      f"| p99 {client['p99'] * 1e3:.2f} ms")
+
+    async def _report_loop(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.report()
+            self.profiler.flush()
+
+    async def serve(self, host='localhost', port=8766):
+        """Servidor websocket de inferencia para tantos tractores como se conecten"""
+        reporter = asyncio.create_task(self._report_loop())
+        try:
+            async with websockets.serve(self.handle, host, port, **WS_CONFIG):
+                print(f"🧠 Servidor de política en ws://{host}:{port} (lote ≤ {self._max_batch_text()})")
+                await asyncio.Future()
+        finally:
+            reporter.cancel()
+            self.profiler.close()
+
+    async def drive_fleet(self, endpoints, protocol='auto'):
+        """Conduce todas las instancias de `endpoints` a la vez con la misma política"""
+        reporter = asyncio.create_task(self._report_loop())
+        try:
+            await asyncio.gather(*(self.drive(uri, protocol) for uri in endpoints))
+        finally:
+            reporter.cancel()
+            self.profiler.close()
+            self.report()
+
+    def _max_batch_text(self):
+        if self.batcher is None:
+            return "sin modelo"
+        return f"{self.batcher.max_batch} o {self.batcher.max_delay * 1e3:.1f} ms"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor de inferencia con micro-batching para una flota de tractores")
+    parser.add_argument("model", nargs="?", default="tractor_model_final.h5")
+    parser.add_argument("--keras", action="store_true", help="Cargar el modelo con Keras")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8766, help="Puerto en el que escuchan los tractores cliente")
+    parser.add_argument("--drive", type=int, nargs="+", metavar="PORT", default=None,
+                        help="En lugar de escuchar, conducir las instancias de Godot/simulador de estos puertos")
+    parser.add_argument("--protocol", choices=["auto", "json", "binary"], default="auto")
+    parser.add_argument("--max-batch", type=int, default=64, help="Tamaño máximo de lote")
+    parser.add_argument("--max-delay", type=float, default=2.0, help="Ventana de agrupación en milisegundos")
+    parser.add_argument("--metrics", default=None, help="Volcar histogramas de latencia (.csv, .jsonl o .prom)")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Segundos entre informes")
+    args = parser.parse_args()
+
+    server = PolicyServer(TractorTester(args.model, use_keras=args.keras), max_batch=args.max_batch,
+                          max_delay=args.max_delay / 1000.0, metrics_path=args.metrics,
+                          report_interval=args.report_every)
+    try:
+        if args.drive:
+            asyncio.run(server.drive_fleet(endpoints_for_ports(args.drive, args.host), args.protocol))
+        else:
+            asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("🚪 Cerrando servidor de política...")
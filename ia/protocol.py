@@ -0,0 +1,121 @@
+import json
+
+import numpy as np
+
+PROTOCOL_VERSION = 2
+
+# Trama de estado: 11 float32 little-endian
+#   [obs0..obs6, reward, done, progress, step_id]
+# seguidos opcionalmente de la posición del surcador (3 float32 más)
+#   [plow_x, plow_z, plowing]
+STATE_DTYPE = np.dtype('<f4')
+STATE_SIZE = 11
+POSITION_SIZE = 3
+
+# Trama de acción: 7 float32 little-endian
+#   [acceleration, steering, brake, four_wheel_drive, reset_episode, step_id, repeat]
+ACTION_SIZE = 7
+
+# step_id viaja como float32: se envuelve antes de perder precisión entera
+STEP_ID_MODULO = 2**24
+
+
+class JsonCodec:
+    """Protocolo original: diccionarios JSON en mensajes de texto"""
+
+    name = 'json'
+
+    def encode_action(self, action, reset_episode=False, step_id=0, repeat=0):
+        acceleration, steering, brake = action
+        return json.dumps({
+            "acceleration": float(acceleration),
+            "steering": float(steering),
+            "brake": float(brake),
+            "four_wheel_drive": False,
+            "reset_episode": bool(reset_episode),
+            "step_id": int(step_id),
+            "repeat": int(repeat)
+        })
+
+    def decode_action(self, message):
+        """Devuelve (acción[3], reset_episode, step_id, repeat)"""
+        data = json.loads(message)
+        action = np.array([data.get("acceleration", 0.0), data.get("steering", 0.0),
+                           float(data.get("brake", 0.0))], dtype=np.float32)
+        return action, bool(data.get("reset_episode", False)), int(data.get("step_id", 0)), int(data.get("repeat", 0))
+
+    def encode_state(self, obs, reward, done, progress, steps=0, step_id=0, position=None):
+        info = {"progress": float(progress), "steps": int(steps), "step_id": int(step_id)}
+        if position is not None:
+            info["position"] = [float(position[0]), float(position[1])]
+            info["plowing"] = bool(position[2])
+        return json.dumps({
+            "observation": [float(x) for x in obs],
+            "reward": float(reward),
+            "done": bool(done),
+            "info": info
+        })
+
+    def decode_state(self, message):
+        """Devuelve (obs, reward, done, progress, step_id, position) o None si el mensaje no es un estado
+
+        `position` es [x, z, plowing] del surcador, o None si el servidor no la envía.
+        """
+        if not isinstance(message, str):
+            return None
+        state = json.loads(message)
+        if 'observation' not in state:
+            return None
+        info = state.get('info', {})
+        obs = np.array(state['observation'], dtype=np.float32)
+        position = None
+        if 'position' in info:
+            x, z = info['position']
+            position = np.array([x, z, float(info.get('plowing', True))], dtype=np.float32)
+        return (obs, float(state['reward']), bool(state['done']),
+                float(info.get('progress', 0.0)), int(info.get('step_id', 0)), position)
+
+
+class BinaryCodec:
+    """Protocolo binario negociado: structs float32 de tamaño fijo"""
+
+    name = 'binary'
+
+    def encode_action(self, action, reset_episode=False, step_id=0, repeat=0):
+        acceleration, steering, brake = action
+        return np.array([acceleration, steering, brake, 0.0, float(reset_episode), step_id, repeat],
+                        dtype=STATE_DTYPE).tobytes()
+
+    def decode_action(self, message):
+        frame = np.frombuffer(message, dtype=STATE_DTYPE, count=ACTION_SIZE)
+        return frame[:3], bool(frame[4] > 0.5), int(frame[5]), int(frame[6])
+
+    def encode_state(self, obs, reward, done, progress, steps=0, step_id=0, position=None):
+        frame = np.empty(STATE_SIZE + (POSITION_SIZE if position is not None else 0), dtype=STATE_DTYPE)
+        frame[:7] = obs
+        frame[7:STATE_SIZE] = (reward, float(done), progress, step_id)
+        if position is not None:
+            frame[STATE_SIZE:] = position
+        return frame.tobytes()
+
+    def decode_state(self, message):
+        if isinstance(message, str):
+            return None
+        # Los servidores antiguos envían solo las 11 primeras; la posición se detecta por el tamaño
+        size = min(len(message) // STATE_DTYPE.itemsize, STATE_SIZE + POSITION_SIZE)
+        frame = np.frombuffer(message, dtype=STATE_DTYPE, count=size)
+        position = frame[STATE_SIZE:] if size == STATE_SIZE + POSITION_SIZE else None
+        return frame[:7], float(frame[7]), bool(frame[8] > 0.5), float(frame[9]), int(frame[10]), position
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec(), BinaryCodec())}
+
+
+def hello_message(protocol='binary', lockstep=False):
+    """Mensaje con el que el cliente pide protocolo y modo de avance"""
+    return json.dumps({"protocol": protocol, "version": PROTOCOL_VERSION, "lockstep": bool(lockstep)})
+
+
+def handshake_message(protocols=('json', 'binary'), lockstep=True):
+    """Primer mensaje del servidor: anuncia los protocolos y modos que entiende"""
+    return json.dumps({"handshake": "ok", "protocols": list(protocols), "lockstep": bool(lockstep)})
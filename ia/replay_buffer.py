@@ -0,0 +1,274 @@
+import os
+
+import numpy as np
+
+OBS_DIM = 7
+ACTION_DIM = 3
+FIELDS = ("obs", "action", "reward", "next_obs", "done")
+
+
+class ReplayBuffer:
+    """Memoria de repetición circular sobre arrays NumPy de tipo fijo
+
+    Las transiciones se guardan en arrays preasignados (obs, action, reward,
+    next_obs, done), así que insertar es O(1) y muestrear es un único indexado
+    avanzado que devuelve lotes contiguos sin pasar por objetos de Python.
+    Con `path` los arrays viven en ficheros `.npy` mapeados en memoria
+    (np.memmap): no ocupan RAM y sobreviven a un reinicio del proceso.
+    Puntero y tamaño viven también en un fichero mapeado (`counters.npy`)
+    que se actualiza en cada inserción, así que tras una caída o un Ctrl+C
+    la memoria se reabre con todas las filas escritas, sin esperar a `flush()`.
+    """
+
+    def __init__(self, capacity=1_000_000, obs_dim=OBS_DIM, action_dim=ACTION_DIM, path=None, seed=None):
+        self.capacity = int(capacity)
+        self.path = path
+        self.rng = np.random.default_rng(seed)
+
+        shapes = {
+            "obs": (self.capacity, obs_dim),
+            "action": (self.capacity, action_dim),
+            "reward": (self.capacity,),
+            "next_obs": (self.capacity, obs_dim),
+            "done": (self.capacity,),
+        }
+        arrays = self._allocate(shapes)
+        self.obs = arrays["obs"]
+        self.action = arrays["action"]
+        self.reward = arrays["reward"]
+        self.next_obs = arrays["next_obs"]
+        self.done = arrays["done"]
+
+    def _allocate(self, shapes):
+        """Reserva los arrays de cada campo y los contadores en RAM o en ficheros mapeados"""
+        if self.path is None:
+            self._counters = np.zeros(2, dtype=np.int64)
+            return {name: np.zeros(shape, dtype=np.float32) for name, shape in shapes.items()}
+        os.makedirs(self.path, exist_ok=True)
+        shapes = self._stored_shapes(shapes)
+        arrays = {name: self._open_memmap(name, shape, np.float32) for name, shape in shapes.items()}
+        self._counters = self._open_memmap("counters", (2,), np.int64)
+        return arrays
+
+    def _stored_shapes(self, shapes):
+        """Adopta la capacidad de una memoria ya guardada en `path` en lugar de borrarla"""
+        filename = os.path.join(self.path, "reward.npy")
+        if not os.path.exists(filename):
+            return shapes
+        stored = len(np.load(filename, mmap_mode="r"))
+        if stored == self.capacity:
+            return shapes
+        print(f"⚠️ {self.path} guarda una memoria de capacidad {stored}: se usa esa en lugar de {self.capacity}")
+        self.capacity = stored
+        return {name: (stored,) + shape[1:] for name, shape in shapes.items()}
+
+    def _open_memmap(self, name, shape, dtype):
+        """Abre (o crea) el fichero .npy que respalda un campo"""
+        filename = os.path.join(self.path, f"{name}.npy")
+        if not os.path.exists(filename):
+            return np.lib.format.open_memmap(filename, mode="w+", dtype=dtype, shape=shape)
+        array = np.lib.format.open_memmap(filename, mode="r+")
+        if array.shape != shape or array.dtype != dtype:
+            # Nunca se sobrescribe: la memoria en disco existe para sobrevivir a reinicios
+            raise ValueError(f"{filename} tiene forma {array.shape} ({array.dtype}), se esperaba {shape} ({np.dtype(dtype)}); "
+                             f"usa otro directorio o bórralo a mano")
+        return array
+
+    @property
+    def ptr(self):
+        return int(self._counters[0])
+
+    @ptr.setter
+    def ptr(self, value):
+        self._counters[0] = value
+
+    @property
+    def size(self):
+        return int(self._counters[1])
+
+    @size.setter
+    def size(self, value):
+        self._counters[1] = value
+
+    def __len__(self):
+        return self.size
+
+    def add(self, obs, action, reward, next_obs, done):
+        """Inserta una transición en O(1) sobrescribiendo la más antigua"""
+        i = self.ptr
+        self.obs[i] = obs
+        self.action[i] = action
+        self.reward[i] = reward
+        self.next_obs[i] = next_obs
+        self.done[i] = done
+        self.ptr = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return i
+
+    def add_batch(self, obs, action, reward, next_obs, done):
+        """Inserta N transiciones de una vez (una por fila)"""
+        n = len(reward)
+        idx = (self.ptr + np.arange(n)) % self.capacity
+        self.obs[idx] = obs
+        self.action[idx] = action
+        self.reward[idx] = reward
+        self.next_obs[idx] = next_obs
+        self.done[idx] = done
+        self.ptr = int((self.ptr + n) % self.capacity)
+        self.size = min(self.size + n, self.capacity)
+        return idx
+
+    def get(self, idx):
+        """Devuelve las transiciones en `idx` como arrays contiguos"""
+        return self.obs[idx], self.action[idx], self.reward[idx], self.next_obs[idx], self.done[idx]
+
+    def sample(self, batch_size):
+        """Muestrea un lote uniforme (con reemplazo)"""
+        idx = self.rng.integers(0, self.size, size=batch_size)
+        return self.get(idx)
+
+    def _chronological(self):
+        """Índices de las transiciones guardadas, de la más antigua a la más reciente"""
+        return (self.ptr - self.size + np.arange(self.size)) % self.capacity
+
+    def snapshot(self):
+        """Copia en orden cronológico de todas las transiciones (para checkpoints)"""
+        return dict(zip(FIELDS, self.get(self._chronological())))
+
+    def restore(self, snapshot):
+        """Inserta una copia hecha con `snapshot`; si no cabe se quedan las más recientes"""
+        n = min(len(snapshot["reward"]), self.capacity)
+        return self.add_batch(*(snapshot[field][len(snapshot[field]) - n:] for field in FIELDS))
+
+    def flush(self):
+        """Fuerza la escritura a disco de los arrays mapeados y los contadores
+
+        No hace falta para sobrevivir a la caída del proceso (las páginas
+        mapeadas ya están en la caché del sistema), sí a la de la máquina.
+        """
+        if self.path is None:
+            return
+        for array in (self.obs, self.action, self.reward, self.next_obs, self.done, self._counters):
+            array.flush()
+
+
+class SumTree:
+    """Árbol de sumas sobre un array plano (montículo 1-indexado)
+
+    Las hojas guardan la prioridad de cada posición de la memoria y cada nodo
+    interno la suma de sus hijos, así que la raíz es la prioridad total.
+    Actualizar y muestrear cuestan O(log N) y se vectorizan sobre el lote.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self.leaf_base = 1 << max(0, (self.capacity - 1).bit_length())
+        self.depth = self.leaf_base.bit_length() - 1
+        self.tree = np.zeros(2 * self.leaf_base, dtype=np.float64)
+
+    def total(self):
+        return self.tree[1]
+
+    def get(self, idx):
+        return self.tree[np.asarray(idx) + self.leaf_base]
+
+    def set(self, i, priority):
+        """Actualiza una sola hoja y propaga la suma hasta la raíz"""
+        node = int(i) + self.leaf_base
+        tree = self.tree
+        tree[node] = priority
+        node >>= 1
+        while node:
+            tree[node] = tree[2 * node] + tree[2 * node + 1]
+            node >>= 1
+
+    def update(self, idx, priorities):
+        """Actualiza varias hojas y recalcula cada nivel de abajo arriba"""
+        nodes = np.asarray(idx, dtype=np.int64) + self.leaf_base
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            # Los nodos repetidos escriben la misma suma, no hace falta np.unique
+            nodes >>= 1
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def find(self, values):
+        """Baja desde la raíz a la hoja cuya suma acumulada contiene cada valor"""
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            left_sum = self.tree[left]
+            go_right = values > left_sum
+            values -= left_sum * go_right
+            nodes = left + go_right
+        return nodes - self.leaf_base
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """Memoria con repetición priorizada proporcional (PER) sobre un SumTree
+
+    `sample` devuelve además los índices muestreados y los pesos de
+    importance sampling; tras el paso de entrenamiento se refrescan las
+    prioridades con `update_priorities(idx, td_errors)`.
+    """
+
+    def __init__(self, capacity=1_000_000, obs_dim=OBS_DIM, action_dim=ACTION_DIM, path=None, seed=None,
+                 alpha=0.6, beta=0.4, beta_increment=1e-4, epsilon=1e-6):
+        super().__init__(capacity, obs_dim, action_dim, path, seed)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.epsilon = epsilon
+        self.max_priority = 1.0
+        self.tree = SumTree(self.capacity)
+        # Las experiencias recuperadas de disco empiezan con prioridad máxima
+        if self.size:
+            self.tree.update(np.arange(self.size), self.max_priority ** self.alpha)
+
+    def add(self, obs, action, reward, next_obs, done):
+        i = super().add(obs, action, reward, next_obs, done)
+        self.tree.set(i, self.max_priority ** self.alpha)
+        return i
+
+    def add_batch(self, obs, action, reward, next_obs, done):
+        idx = super().add_batch(obs, action, reward, next_obs, done)
+        self.tree.update(idx, np.full(len(idx), self.max_priority ** self.alpha))
+        return idx
+
+    def sample(self, batch_size):
+        """Muestreo estratificado proporcional a la prioridad
+
+        Devuelve (obs, action, reward, next_obs, done, idx, weights).
+        """
+        total = self.tree.total()
+        segment = total / batch_size
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * segment
+        idx = np.minimum(self.tree.find(values), self.size - 1)
+
+        probs = self.tree.get(idx) / total
+        weights = (self.size * probs) ** (-self.beta)
+        weights = (weights / weights.max()).astype(np.float32)
+        self.beta = min(1.0, self.beta + self.beta_increment)
+
+        return (*self.get(idx), idx, weights)
+
+    def snapshot(self):
+        snapshot = super().snapshot()
+        snapshot["priority"] = self.tree.get(self._chronological())
+        snapshot["beta"] = np.array(self.beta)
+        snapshot["max_priority"] = np.array(self.max_priority)
+        return snapshot
+
+    def restore(self, snapshot):
+        idx = super().restore(snapshot)
+        if "priority" in snapshot:
+            self.tree.update(idx, snapshot["priority"][len(snapshot["priority"]) - len(idx):])
+            self.beta = float(snapshot["beta"])
+            self.max_priority = float(snapshot["max_priority"])
+        return idx
+
+    def update_priorities(self, idx, td_errors):
+        """Refresca las prioridades con el error TD absoluto del último lote"""
+        priorities = np.abs(td_errors) + self.epsilon
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self.tree.update(idx, priorities ** self.alpha)
@@ -0,0 +1,218 @@
+import argparse
+import asyncio
+import json
+
+import numpy as np
+import websockets
+
+from coverage import OBSTACULO, TIERRA_SIN_ARAR, CoverageMap
+from protocol import CODECS, handshake_message
+
+# Modelo cinemático sencillo del tractor (unidades de Godot: metros y segundos)
+ACCELERATION = 6.0      # m/s² con aceleración 1.0
+BRAKE_DECEL = 2.4       # brake_force / max_torque de tractor_control.gd aplicado a ACCELERATION
+DRAG = 0.6              # rozamiento proporcional a la velocidad
+MAX_STEER = 0.4         # rad, como `final_steering * 0.4`
+STEER_RATE = 2.5        # suavizado del giro, como el lerp de _physics_process
+WHEELBASE = 2.5
+PLOW_OFFSET = 2.0       # el surcador va detrás del eje trasero
+START_POSITION = (1.0, 0.0)
+
+
+class FieldSim:
+    """Sustituto NumPy del entorno Godot con N campos avanzados a la vez
+
+    Reimplementa la matriz de terreno02.gd (celdas sin arar / aradas /
+    obstáculos, en un CoverageMap), la recompensa de `calculate_reward` y
+    la observación de `get_observation` sobre un modelo cinemático de
+    bicicleta. Todo el estado son arrays con una fila por entorno, así que
+    un paso de miles de entornos es una sola operación vectorizada.
+    """
+
+    def __init__(self, num_envs=1, rows=40, cols=40, spacing=2.0, obstacle_prob=0.004, max_steps=2000,
+                 physics_fps=60, seed=None):
+        self.num_envs = num_envs
+        self.rows = rows
+        self.cols = cols
+        self.spacing = spacing
+        self.obstacle_prob = obstacle_prob
+        self.max_steps = max_steps
+        self.dt = 1.0 / physics_fps
+        self.rng = np.random.default_rng(seed)
+
+        self.coverage = CoverageMap(num_envs, rows, cols, spacing)
+        self.pos = np.zeros((num_envs, 2))          # (x, z)
+        self.yaw = np.zeros(num_envs)
+        self.speed = np.zeros(num_envs)
+        self.steer = np.zeros(num_envs)
+        self.last_progress = np.zeros(num_envs)
+        self.stuck_timer = np.zeros(num_envs)
+        self.steps = np.zeros(num_envs, dtype=np.int64)
+        self._limit = np.array([cols, rows]) * spacing / 2.0 + spacing  # línea de la valla
+        self.reset()
+
+    def reset(self, indices=None):
+        """Regenera el campo y recoloca el tractor; devuelve las observaciones de `indices`"""
+        idx = np.arange(self.num_envs) if indices is None else np.asarray(indices)
+        obstacles = self.rng.random((len(idx), self.rows, self.cols)) < self.obstacle_prob
+        self.coverage.reset(idx, obstacles)
+        self.pos[idx] = START_POSITION
+        self.yaw[idx] = 0.0
+        self.speed[idx] = 0.0
+        self.steer[idx] = 0.0
+        self.last_progress[idx] = 0.0
+        self.stuck_timer[idx] = 0.0
+        self.steps[idx] = 0
+        return self.observation()[idx]
+
+    def progress(self):
+        return self.coverage.progress()
+
+    def observation(self):
+        """Mismo vector de 7 valores que get_observation() en tractor_control.gd"""
+        velocity = self.speed[:, None] * np.column_stack([np.sin(self.yaw), np.cos(self.yaw)])
+        return np.column_stack([
+            self.pos / 20.0,
+            np.sin(self.yaw), np.cos(self.yaw),
+            velocity / 10.0,
+            self.progress() / 100.0,
+        ]).astype(np.float32)
+
+    def plow_position(self):
+        """Posición (x, z) del surcador, que va detrás del eje trasero"""
+        return self.pos - np.column_stack([np.sin(self.yaw), np.cos(self.yaw)]) * PLOW_OFFSET
+
+    def _tick(self, actions):
+        """Un tick de física para todos los entornos"""
+        acceleration, steering, brake = actions[:, 0], actions[:, 1], actions[:, 2]
+        dt = self.dt
+
+        self.steer += (steering * MAX_STEER - self.steer) * min(1.0, STEER_RATE * dt)
+        braking = np.where(brake > 0, BRAKE_DECEL * np.sign(self.speed), 0.0)
+        self.speed += (acceleration * ACCELERATION - braking - DRAG * self.speed) * dt
+        self.yaw += self.speed / WHEELBASE * np.tan(self.steer) * dt
+
+        heading = np.column_stack([np.sin(self.yaw), np.cos(self.yaw)])
+        new_pos = np.clip(self.pos + heading * self.speed[:, None] * dt, -self._limit, self._limit)
+
+        # Los obstáculos tienen colisión: el tractor se detiene delante
+        i, j, inside = self.coverage.cells(new_pos)
+        blocked = inside & (self.coverage.grid[np.arange(self.num_envs), i, j] == OBSTACULO)
+        self.pos = np.where(blocked[:, None], self.pos, new_pos)
+        self.speed[blocked] = 0.0
+
+        # El surcador ara la celda que queda detrás del tractor
+        self.coverage.plow(self.pos - heading * PLOW_OFFSET)
+
+        self.steps += 1
+
+    def step(self, actions, repeat=1):
+        """Aplica las acciones (N, 3) durante `repeat` ticks; devuelve (obs, rewards, dones, progress)"""
+        actions = np.asarray(actions, dtype=np.float64).reshape(self.num_envs, 3)
+        for _ in range(repeat):
+            self._tick(actions)
+
+        # calculate_reward() de tractor_control.gd
+        progress = self.progress()
+        rewards = (progress - self.last_progress) * 10.0
+        stuck = np.abs(self.speed) < 0.1
+        self.stuck_timer = np.where(stuck, self.stuck_timer + 0.016, 0.0)
+        rewards -= self.stuck_timer * 0.1
+        rewards += 0.1 * (self.coverage.terrain_type(self.pos) == TIERRA_SIN_ARAR)
+        rewards -= 0.01
+        self.last_progress = progress
+
+        dones = (self.steps > self.max_steps) | (progress >= 99.9)
+        return self.observation(), rewards.astype(np.float32), dones, progress.astype(np.float32)
+
+
+class AsyncFieldEnv:
+    """FieldSim con la interfaz asíncrona de VecTractorEnv, para entrenar sin Godot ni websockets"""
+
+    protocols = ['numpy']
+
+    def __init__(self, num_envs=1, repeat=1, seed=None, **kwargs):
+        self.sim = FieldSim(num_envs, seed=seed, **kwargs)
+        self.repeat = repeat
+
+    def __len__(self):
+        return self.sim.num_envs
+
+    @property
+    def coverage(self):
+        """El CoverageMap del simulador, con la misma interfaz que VecTractorEnv(coverage=True)"""
+        return self.sim.coverage
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def reset(self, indices=None):
+        return self.sim.reset(indices)
+
+    async def step(self, actions, repeat=None):
+        # Ceder el bucle de eventos: sin red no habría ningún punto donde atender Ctrl+C
+        await asyncio.sleep(0)
+        return self.sim.step(actions, self.repeat if repeat is None else repeat)
+
+
+def _plow_state(sim):
+    """[x, z, plowing] del surcador del primer campo; en el simulador siempre está bajado"""
+    x, z = sim.plow_position()[0]
+    return (x, z, 1.0)
+
+
+async def _serve_client(ws, seed=None):
+    """Atiende un cliente con el mismo protocolo que tractor_control.gd
+
+    A diferencia de Godot no hay bucle de render: se responde un estado por
+    acción recibida, lo más rápido posible.
+    """
+    sim = FieldSim(1, seed=seed)
+    codec = CODECS['json']
+    lockstep = False
+
+    await ws.send(handshake_message())
+    await ws.send(codec.encode_state(sim.observation()[0], 0.0, False, 0.0, position=_plow_state(sim)))
+    try:
+        async for message in ws:
+            if isinstance(message, str):
+                data = json.loads(message)
+                if 'protocol' in data:
+                    codec = CODECS[data['protocol']]
+                    lockstep = bool(data.get('lockstep', False))
+                    await ws.send(json.dumps({"protocol": codec.name, "lockstep": lockstep}))
+                    continue
+                if codec.name != 'json':
+                    continue
+
+            action, reset_episode, step_id, repeat = codec.decode_action(message)
+            if reset_episode:
+                sim.reset()
+            obs, rewards, dones, progress = sim.step(action[None], repeat=max(1, repeat) if lockstep else 1)
+            await ws.send(codec.encode_state(obs[0], rewards[0], dones[0], progress[0], sim.steps[0], step_id,
+                                             position=_plow_state(sim)))
+    except websockets.ConnectionClosed:
+        pass
+
+
+async def serve(host='localhost', port=8765, seed=None):
+    """Servidor websocket que sustituye a Godot: un FieldSim por conexión"""
+    async with websockets.serve(lambda ws: _serve_client(ws, seed), host, port):
+        print(f"🌾 Simulador NumPy escuchando en ws://{host}:{port}")
+        await asyncio.Future()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulador NumPy del campo servido por websocket")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.seed))
+    except KeyboardInterrupt:
+        print("🚪 Cerrando simulador...")
@@ -1,19 +1,38 @@
+import time
+
+_START = time.perf_counter()
+
 import numpy as np
-from keras.models import load_model
 import websockets
 import asyncio
 import json
 
+from dataset import TransitionRecorder
+from instrumentation import max_rss_mb
+from numpy_policy import NumpyPolicy
+
 class TractorTester:
-    def __init__(self, model_path='tractor_model_final.h5'):
-        """Inicializa el tester con el modelo entrenado"""
+    def __init__(self, model_path='tractor_model_final.h5', use_keras=False):
+        """Inicializa el tester con el modelo entrenado
+
+        Por defecto los pesos se leen directamente del `.h5` (o del `.npz`
+        exportado por train_agent) y TensorFlow no llega a cargarse. Keras
+        solo se importa si se pide explícitamente con `use_keras=True`.
+        """
+        self.model = None
         try:
-            self.model = load_model(model_path)
+            if use_keras:
+                from keras.models import load_model
+                self.model = load_model(model_path)
+                self.policy = NumpyPolicy.from_model(self.model)
+            else:
+                self.policy = NumpyPolicy.load(model_path)
+            # La inferencia paso a paso se hace con NumPy, sin model.predict
             print(f"✅ Modelo cargado exitosamente: {model_path}")
         except Exception as e:
             print(f"❌ Error cargando modelo: {e}")
             print("🤖 Usando comportamiento por defecto")
-            self.model = None
+            self.policy = None
         
         # Variables para giros consecutivos
         self.current_steering = 0.0
@@ -34,7 +53,7 @@ class TractorTester:
 
     def predict_action(self, obs):
         """Predice acción usando el modelo o comportamiento por defecto"""
-        if self.model is None:
+        if self.policy is None:
             # Comportamiento por defecto: avanzar y girar fuerte consecutivo
             acceleration = 0.7
             steering = self.get_consecutive_steering()
@@ -42,30 +61,49 @@ class TractorTester:
             return [acceleration, steering, brake]
         
         try:
-            obs = np.array(obs).reshape(1, -1)
-            action = self.model.predict(obs, verbose=0)[0]
-            
-            # Asegurar rangos correctos
-            acceleration = np.clip(action[0], 0, 1)
-            steering = np.clip(action[1], -1, 1)
-            brake = np.clip(action[2], 0, 0.2)
-            
-            # Si el modelo predice acelerar muy poco, usar comportamiento por defecto
-            if acceleration < 0.3:
-                acceleration = 0.7
-                steering = self.get_consecutive_steering() if abs(steering) < 0.1 else steering
-                brake = 0.0
-            
-            return [acceleration, steering, brake]
-            
+            return self.adjust_action(self.policy.predict(obs)[0])
         except Exception as e:
             print(f"⚠️ Error en predicción: {e}")
             # Fallback a comportamiento por defecto
             return [0.7, np.random.uniform(-0.8, 0.8), 0.0]
 
-async def test_model(model_path='tractor_model_final.h5'):
-    """Función principal para testear el modelo"""
-    tester = TractorTester(model_path)
+    def adjust_action(self, action):
+        """Recorta la salida de la red a rangos válidos y aplica el comportamiento por defecto si acelera poco
+
+        Separado de predict_action para que policy_server.py pueda predecir
+        en lote y ajustar después la acción de cada tractor con su propio
+        estado de giro.
+        """
+        # Asegurar rangos correctos
+        acceleration = np.clip(action[0], 0, 1)
+        steering = np.clip(action[1], -1, 1)
+        brake = np.clip(action[2], 0, 0.2)
+        
+        # Si el modelo predice acelerar muy poco, usar comportamiento por defecto
+        if acceleration < 0.3:
+            acceleration = 0.7
+            steering = self.get_consecutive_steering() if abs(steering) < 0.1 else steering
+            brake = 0.0
+        
+        return [acceleration, steering, brake]
+
+def report_startup():
+    """Muestra el tiempo de arranque y la memoria residente máxima del proceso"""
+    elapsed = time.perf_counter() - _START
+    rss_mb = max_rss_mb()
+    memory = f" | Memoria residente máx.: {rss_mb:.0f} MB" if rss_mb is not None else ""
+    print(f"⏱️  Arranque en frío: {elapsed:.2f} s{memory}")
+    return elapsed, rss_mb
+
+async def test_model(model_path='tractor_model_final.h5', use_keras=False, record_path=None):
+    """Función principal para testear el modelo
+
+    Con `record_path` las transiciones de la prueba se graban en shards,
+    igual que en train_agent, para el entrenamiento offline.
+    """
+    tester = TractorTester(model_path, use_keras=use_keras)
+    recorder = TransitionRecorder(record_path) if record_path else None
+    report_startup()
     
     # Configuración de conexión
     ws_config = {
@@ -77,6 +115,7 @@ async def test_model(model_path='tractor_model_final.h5'):
     episode = 1
     total_reward = 0
     steps = 0
+    previous = None  # (obs, acción) del paso anterior, para formar la transición
     
     print(f"🚜 Iniciando prueba del modelo: {model_path}")
     print("=" * 50)
@@ -106,8 +145,13 @@ async def test_model(model_path='tractor_model_final.h5'):
                         steps = 0
                         print(f"\n🎮 Iniciando episodio {episode}")
                     
+                    if recorder is not None and previous is not None:
+                        recorder.add(previous[0], previous[1], state.get('reward', 0.0), obs, state.get('done', False))
+                    
                     # Predecir acción
                     action = tester.predict_action(obs)
+                    # Tras un estado terminal la acción reinicia el episodio: no hay transición que grabar
+                    previous = None if state.get('done', False) else (obs, action)
                     
                     # Enviar acción
                     await ws.send(json.dumps({
@@ -141,19 +185,27 @@ async def test_model(model_path='tractor_model_final.h5'):
     except Exception as e:
         print(f"❌ Error de conexión: {e}")
         return False
+    finally:
+        if recorder is not None:
+            recorder.close()
+            print(f"🎞️  {len(recorder)} transiciones grabadas en {record_path}")
     
     return True
 
 if __name__ == "__main__":
     import sys
     
-    # Usar argumento de línea de comandos o valor por defecto
-    model_path = sys.argv[1] if len(sys.argv) > 1 else 'tractor_model_final.h5'
+    # Usar argumento de línea de comandos o valor por defecto; --keras carga el modelo con Keras
+    # y --record=DIR graba las transiciones de la prueba
+    use_keras = '--keras' in sys.argv
+    record_path = next((arg.split('=', 1)[1] for arg in sys.argv[1:] if arg.startswith('--record=')), None)
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    model_path = args[0] if args else 'tractor_model_final.h5'
     
     print(f"🔧 Modelo a probar: {model_path}")
     
     try:
-        asyncio.run(test_model(model_path))
+        asyncio.run(test_model(model_path, use_keras=use_keras, record_path=record_path))
     except KeyboardInterrupt:
         print("\n🛑 Prueba detenida manualmente")
     except Exception as e:
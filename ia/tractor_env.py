@@ -0,0 +1,203 @@
+import asyncio
+import json
+
+import numpy as np
+import websockets
+
+from coverage import CoverageMap
+from instrumentation import NULL_PROFILER
+from protocol import CODECS, STEP_ID_MODULO, hello_message
+
+DEFAULT_URI = 'ws://localhost:8765'
+
+# Configuración de conexión
+WS_CONFIG = {
+    'ping_interval': None,
+    'close_timeout': 1,
+    'max_size': 2**20  # 1MB para mensajes grandes
+}
+
+
+def endpoints_for_ports(ports, host='localhost'):
+    """Lista de URIs para varias instancias de Godot en distintos puertos"""
+    return [f'ws://{host}:{port}' for port in ports]
+
+
+class TractorEnv:
+    """Conexión websocket con una instancia del simulador Godot
+
+    Con `protocol='auto'` (por defecto) se negocia el protocolo binario si el
+    servidor lo anuncia en su handshake; con servidores antiguos se sigue
+    usando JSON. `protocol='json'` fuerza el formato de texto original.
+
+    Con `lockstep=True` el simulador deja de emitir un estado por frame:
+    cada acción lleva un step_id y un número de repeticiones k, Godot avanza
+    exactamente k ticks de física con esa acción y responde una sola vez.
+
+    Con un `profiler` (ver instrumentation.py) se miden las etapas 'send',
+    'recv' y 'decode' de cada mensaje.
+
+    Si el servidor incluye la posición del surcador en el estado, la última
+    recibida queda en `position` ([x, z, plowing]); si no, es None.
+    """
+
+    def __init__(self, uri=DEFAULT_URI, protocol='auto', lockstep=False, repeat=1, profiler=None):
+        self.uri = uri
+        self.protocol = protocol
+        self.lockstep = lockstep
+        self.repeat = repeat
+        self.profiler = profiler or NULL_PROFILER
+        self.codec = CODECS['json']
+        self.step_id = 0
+        self.position = None
+        self.ws = None
+
+    async def connect(self):
+        self.ws = await websockets.connect(self.uri, **WS_CONFIG)
+        self.codec = CODECS['json']
+        if self.protocol != 'json' or self.lockstep:
+            await self._negotiate()
+
+    async def _negotiate(self):
+        """Pide protocolo binario y/o modo lockstep según lo que anuncie el handshake"""
+        first = json.loads(await self.ws.recv())
+        binary = self.protocol != 'json' and 'binary' in first.get('protocols', [])
+        if self.protocol == 'binary' and not binary:
+            raise ConnectionError(f"{self.uri} no soporta el protocolo binario")
+        if self.lockstep and not first.get('lockstep', False):
+            raise ConnectionError(f"{self.uri} no soporta el modo lockstep")
+        if not (binary or self.lockstep):
+            return
+        await self.ws.send(hello_message('binary' if binary else 'json', lockstep=self.lockstep))
+        # Los estados JSON que lleguen antes de la confirmación se descartan
+        while True:
+            message = await self.ws.recv()
+            if isinstance(message, str):
+                ack = json.loads(message)
+                if 'protocol' in ack:
+                    self.codec = CODECS[ack['protocol']]
+                    return
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+            self.ws = None
+
+    async def recv_state(self):
+        """Espera el siguiente estado (obs, reward, done, progress), ignorando otros mensajes
+
+        En lockstep también se descartan respuestas a pasos anteriores.
+        """
+        profiler = self.profiler
+        while True:
+            t = profiler.start()
+            message = await self.ws.recv()
+            profiler.stop('recv', t)
+            t = profiler.start()
+            state = self.codec.decode_state(message)
+            profiler.stop('decode', t)
+            if state is None:
+                continue
+            if self.lockstep and state[4] != self.step_id:
+                continue
+            self.position = state[5]
+            return state[:4]
+
+    async def _send_action(self, action, reset_episode=False, repeat=None):
+        ticks = 0
+        if self.lockstep:
+            self.step_id = (self.step_id + 1) % STEP_ID_MODULO
+            ticks = self.repeat if repeat is None else repeat
+        t = self.profiler.start()
+        await self.ws.send(self.codec.encode_action(action, reset_episode, self.step_id, ticks))
+        self.profiler.stop('send', t)
+
+    async def reset(self):
+        """Reinicia el episodio en Godot y devuelve el primer estado"""
+        await self._send_action((0.0, 0.0, 0.0), reset_episode=True, repeat=1)
+        return await self.recv_state()
+
+    async def step(self, action, repeat=None):
+        """Envía (aceleración, dirección, freno) y devuelve el nuevo estado
+
+        En lockstep la acción se mantiene `repeat` ticks de física (por defecto
+        el `repeat` del entorno) antes de que llegue la respuesta.
+        """
+        await self._send_action(action, repeat=repeat)
+        return await self.recv_state()
+
+
+class VecTractorEnv:
+    """N instancias de Godot avanzadas a la vez con asyncio
+
+    Cada tick envía las N acciones y espera los N estados en paralelo, así
+    que el ritmo lo marca la instancia más lenta y no la suma de todas.
+    Las observaciones se devuelven apiladas en un array (N, 7) listo para
+    una sola predicción del modelo.
+
+    Con `coverage=True` (o un CoverageMap propio para campos distintos del
+    40x40 de terreno02.gd) se mantiene en `coverage` un mapa de lo arado a
+    partir de la posición del surcador que envíen las instancias. Godot
+    marca una celda por tick de física: con lockstep y repeat=k se marcan
+    k puntos sobre la recta entre la posición anterior y la nueva, exacto
+    en línea recta y aproximado en las curvas cerradas.
+    """
+
+    def __init__(self, uris, protocol='auto', lockstep=False, repeat=1, profiler=None, coverage=None):
+        self.envs = [TractorEnv(uri, protocol, lockstep, repeat, profiler) for uri in uris]
+        self.coverage = CoverageMap(len(self.envs)) if coverage is True else coverage or None
+        self._last_position = [None] * len(self.envs)
+
+    def __len__(self):
+        return len(self.envs)
+
+    @property
+    def protocols(self):
+        """Protocolos negociados con las instancias"""
+        return sorted({env.codec.name for env in self.envs})
+
+    async def connect(self):
+        await asyncio.gather(*(env.connect() for env in self.envs))
+
+    async def close(self):
+        await asyncio.gather(*(env.close() for env in self.envs), return_exceptions=True)
+
+    async def reset(self, indices=None):
+        """Reinicia las instancias indicadas (todas por defecto) y devuelve sus observaciones"""
+        if indices is None:
+            indices = range(len(self.envs))
+        states = await asyncio.gather(*(self.envs[i].reset() for i in indices))
+        if self.coverage is not None:
+            self.coverage.reset(list(indices))
+            for i in indices:
+                # Tras reiniciar el tractor aparece en otro sitio: no hay recorrido que marcar
+                self._last_position[i] = None
+            self._update_coverage(list(indices))
+        return np.array([s[0] for s in states], dtype=np.float32)
+
+    def _update_coverage(self, indices, ticks=None):
+        """Ara en el mapa el recorrido del surcador de las instancias que enviaron su posición
+
+        `ticks` (uno por instancia) son los ticks de física del último paso;
+        sin lockstep cada estado recibido es un frame y basta con su punto.
+        """
+        indices = [i for i in indices if self.envs[i].position is not None]
+        if not indices:
+            return
+        positions = np.array([self.envs[i].position for i in indices])
+        start = np.array([positions[n, :2] if self._last_position[i] is None else self._last_position[i]
+                          for n, i in enumerate(indices)])
+        ticks = 1 if ticks is None else np.asarray(ticks)[indices]
+        self.coverage.plow_path(start, positions[:, :2], ticks, positions[:, 2] > 0.5, indices)
+        for n, i in enumerate(indices):
+            self._last_position[i] = positions[n, :2]
+
+    async def step(self, actions, repeat=None):
+        """Avanza todas las instancias; devuelve (obs, rewards, dones, progress)"""
+        states = await asyncio.gather(*(env.step(a, repeat) for env, a in zip(self.envs, actions)))
+        obs, rewards, dones, progress = zip(*states)
+        if self.coverage is not None:
+            ticks = [(env.repeat if repeat is None else repeat) if env.lockstep else 1 for env in self.envs]
+            self._update_coverage(range(len(self.envs)), ticks)
+        return (np.array(obs, dtype=np.float32), np.array(rewards, dtype=np.float32),
+                np.array(dones, dtype=bool), np.array(progress, dtype=np.float32))
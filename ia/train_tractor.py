@@ -1,18 +1,48 @@
 import websockets
 import asyncio
-import json
+import argparse
+import os
 import numpy as np
 from keras.models import Sequential
 from keras.layers import Dense
-from collections import deque
-import random
 import time
-import matplotlib.pyplot as plt
+
+from replay_buffer import PrioritizedReplayBuffer, ReplayBuffer
+import checkpoint
+from checkpoint import CheckpointManager
+from dataset import TransitionRecorder
+from instrumentation import NULL_PROFILER, Profiler
+from learner import Learner, SharedReplayBuffer
+from metrics import MetricsLog, plot_metrics
+from numpy_policy import NumpyPolicy
+from sim_env import AsyncFieldEnv
+from tractor_env import DEFAULT_URI, VecTractorEnv, endpoints_for_ports
 
 class TractorAgent:
-    def __init__(self):
+    def __init__(self, memory_size=2000, memory_path=None, prioritized=False, memory=None, history_path=None,
+                 target_update='hard', target_sync_every=100, tau=0.005, double_dqn=True):
         self.model = self._build_model()
-        self.memory = deque(maxlen=2000)
+        # Copia NumPy de la red para actuar sin la sobrecarga de model.predict
+        self.policy = NumpyPolicy.from_model(self.model)
+        self._policy_stale = False
+        # Red objetivo congelada (también en NumPy): 'hard' copia los pesos cada
+        # target_sync_every entrenamientos, 'soft' los mezcla con tau en cada uno
+        # y None usa la propia red online como en la versión original
+        if target_update not in ('hard', 'soft', None):
+            raise ValueError(f"target_update debe ser 'hard', 'soft' o None, no {target_update!r}")
+        self.target = NumpyPolicy.from_model(self.model)
+        self.target_update = target_update
+        self.target_sync_every = target_sync_every
+        self.tau = tau
+        self.double_dqn = double_dqn
+        self.train_steps = 0
+        self.prioritized = prioritized
+        if memory is not None:
+            self.memory = memory
+        elif prioritized:
+            self.memory = PrioritizedReplayBuffer(memory_size, path=memory_path)
+        else:
+            self.memory = ReplayBuffer(memory_size, path=memory_path)
         self.gamma = 0.95    # Factor de descuento
         self.epsilon = 1.0   # Exploración inicial
         self.epsilon_min = 0.01
@@ -20,11 +50,8 @@ class TractorAgent:
         self.batch_size = 32
         self.train_interval = 4
         
-        # Métricas para gráficas
-        self.episode_rewards = []
-        self.episode_lengths = []
-        self.epsilon_history = []
-        self.progress_history = []
+        # Métricas para gráficas: historial por bloques con memoria constante
+        self.history = MetricsLog(history_path)
 
     def _build_model(self):
         """Crea el modelo de la red neuronal"""
@@ -38,238 +65,419 @@ class TractorAgent:
 
     def remember(self, state, action, reward, next_state, done):
         """Almacena experiencias en memoria"""
-        self.memory.append((state, action, reward, next_state, done))
+        self.memory.add(state, action, reward, next_state, done)
 
     def act(self, state):
         """Selecciona acción: exploración o explotación con comportamiento por defecto"""
-        if np.random.rand() <= self.epsilon:
-            # Comportamiento exploratorio con prioridad en avanzar y girar
-            acceleration = random.uniform(0.5, 1.0)    # Priorizar acelerar
-            steering = random.uniform(-0.8, 0.8)       # Giros moderados
-            brake = random.uniform(0, 0.1)             # Freno mínimo
-            return (acceleration, steering, brake)
-        
-        state = np.array(state).reshape(1, -1)
-        act_values = self.model.predict(state, verbose=0)
-        
-        # Si el modelo no está entrenado o da valores muy bajos, usar comportamiento por defecto
-        if np.all(np.abs(act_values[0]) < 0.1):
-            # Comportamiento por defecto: avanzar y girar suavemente
-            acceleration = 0.7  # Acelerar moderadamente
-            steering = random.uniform(-0.3, 0.3)  # Giro suave aleatorio
-            brake = 0.0  # No frenar
-            return (acceleration, steering, brake)
-        
+        return tuple(self.act_batch([state])[0])
+
+    def act_batch(self, states):
+        """Selecciona una acción por fila de `states` con una sola predicción del modelo"""
+        states = np.asarray(states, dtype=np.float32).reshape(-1, 7)
+        n = len(states)
+        actions = np.empty((n, 3), dtype=np.float32)
+
+        # Comportamiento exploratorio con prioridad en avanzar y girar
+        explore = np.random.rand(n) <= self.epsilon
+        k = int(explore.sum())
+        actions[explore, 0] = np.random.uniform(0.5, 1.0, k)    # Priorizar acelerar
+        actions[explore, 1] = np.random.uniform(-0.8, 0.8, k)   # Giros moderados
+        actions[explore, 2] = np.random.uniform(0, 0.1, k)      # Freno mínimo
+
+        exploit = ~explore
+        if exploit.any():
+            if self._policy_stale:
+                self.policy.set_weights(self.model.get_weights())
+                self._policy_stale = False
+            act_values = self.policy.predict(states[exploit])
+            actions[exploit] = self._policy_actions(act_values)
+        return actions
+
+    def set_weights(self, weights):
+        """Carga pesos nuevos (p. ej. del learner) en el modelo, la copia NumPy y la red objetivo"""
+        self.model.set_weights(weights)
+        self.policy.set_weights(weights)
+        self.target.set_weights(weights)
+        self._policy_stale = False
+
+    def _policy_actions(self, act_values):
+        """Convierte las salidas de la red en acciones válidas"""
         # Asegurar que los valores estén en los rangos correctos
-        acceleration = np.clip(act_values[0][0], 0, 1)
-        steering = np.clip(act_values[0][1], -1, 1)
-        brake = np.clip(act_values[0][2], 0, 0.2)
-        
+        acceleration = np.clip(act_values[:, 0], 0, 1)
+        steering = np.clip(act_values[:, 1], -1, 1)
+        brake = np.clip(act_values[:, 2], 0, 0.2)
+
         # Priorizar aceleración si es muy baja
-        if acceleration < 0.3:
-            acceleration = 0.5
-        
-        return (acceleration, steering, brake)
+        acceleration = np.where(acceleration < 0.3, 0.5, acceleration)
+
+        # Si el modelo no está entrenado o da valores muy bajos, usar comportamiento por defecto:
+        # acelerar moderadamente, girar suavemente y no frenar
+        untrained = np.all(np.abs(act_values) < 0.1, axis=1)
+        k = int(untrained.sum())
+        acceleration[untrained] = 0.7
+        steering[untrained] = np.random.uniform(-0.3, 0.3, k)
+        brake[untrained] = 0.0
+
+        return np.stack([acceleration, steering, brake], axis=1)
 
     def replay(self):
-        """Entrena con experiencias pasadas"""
+        """Entrena con un lote de la memoria en un solo paso vectorizado"""
         if len(self.memory) < self.batch_size:
             return
 
-        minibatch = random.sample(self.memory, self.batch_size)
-        states = np.array([x[0] for x in minibatch])
-        targets = self.model.predict(states, verbose=0)
+        if self.prioritized:
+            states, _, rewards, next_states, dones, idx, weights = self.memory.sample(self.batch_size)
+        else:
+            states, _, rewards, next_states, dones = self.memory.sample(self.batch_size)
+            weights = None
 
-        for i, (state, action, reward, next_state, done) in enumerate(minibatch):
-            target = reward
-            if not done:
-                next_state = np.array(next_state).reshape(1, -1)
-                Q_future = np.max(self.model.predict(next_state, verbose=0)[0])
-                target = reward + Q_future * self.gamma
-            
-            # Actualizar solo la acción tomada
-            targets[i] = action  # Usar la acción completa como target
-            targets[i] = np.array([target, target, target])  # Simplificado para este caso
+        td_errors = self.train_batch(states, rewards, next_states, dones, weights)
+        if self.prioritized:
+            self.memory.update_priorities(idx, td_errors)
+
+    def train_batch(self, states, rewards, next_states, dones, weights=None):
+        """Un paso de entrenamiento sobre un lote cualquiera; devuelve el error TD de cada transición
+
+        La acción guardada no interviene: las 3 salidas son aceleración,
+        dirección y freno, no valores de acciones discretas, así que como en
+        la versión original el mismo objetivo escalar se copia en las 3. Con
+        `double_dqn` la red online elige la salida máxima en s' y la red
+        objetivo la evalúa; ese argmax es entre canales, no entre acciones.
+        """
+        n = len(states)
+        # Una sola predicción online para todos los next_state y state
+        q_online = self.model.predict_on_batch(np.concatenate([next_states, states]))
+        q_next_online = q_online[:n]
+        q_current = q_online[n:]
+        q_next = self.target.predict(next_states) if self.target_update else q_next_online
+
+        rows = np.arange(n)
+        if self.double_dqn:
+            q_future = q_next[rows, np.argmax(q_next_online, axis=1)]
+        else:
+            q_future = np.max(q_next, axis=1)
+        # Los terminales se anulan con la máscara
+        target = rewards + self.gamma * q_future * (1.0 - dones)
 
-        self.model.fit(states, targets, epochs=1, verbose=0)
+        targets = np.repeat(target[:, None], q_current.shape[1], axis=1).astype(np.float32)
+        self.model.train_on_batch(states, targets, sample_weight=weights)
+        self._policy_stale = True
+        self.train_steps += 1
+        self._update_target()
+        return target - q_current.max(axis=1)
 
-    def save_training_plots(self):
+    def _update_target(self):
+        """Sincroniza la red objetivo según `target_update`"""
+        if self.target_update == 'soft':
+            online = self.model.get_weights()
+            self.target.set_weights([self.tau * w + (1.0 - self.tau) * t
+                                     for w, t in zip(online, self.target.get_weights())])
+        elif self.target_update == 'hard' and self.train_steps % self.target_sync_every == 0:
+            self.target.set_weights(self.model.get_weights())
+
+    def save_training_plots(self, filename='training_progress.png', dpi=300):
         """Genera y guarda gráficas del entrenamiento"""
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 10))
-        
-        # Gráfica 1: Recompensas por episodio
-        ax1.plot(self.episode_rewards, 'b-', alpha=0.7)
-        ax1.set_title('Recompensas por Episodio')
-        ax1.set_xlabel('Episodio')
-        ax1.set_ylabel('Recompensa Total')
-        ax1.grid(True, alpha=0.3)
-        
-        # Promedio móvil de recompensas
-        if len(self.episode_rewards) > 10:
-            window = min(20, len(self.episode_rewards))
-            moving_avg = np.convolve(self.episode_rewards, np.ones(window)/window, mode='valid')
-            ax1.plot(range(window-1, len(self.episode_rewards)), moving_avg, 'r-', linewidth=2, label='Promedio Móvil')
-            ax1.legend()
-        
-        # Gráfica 2: Epsilon (exploración) vs tiempo
-        ax2.plot(self.epsilon_history, 'g-')
-        ax2.set_title('Decaimiento de Epsilon (Exploración)')
-        ax2.set_xlabel('Episodio')
-        ax2.set_ylabel('Epsilon')
-        ax2.grid(True, alpha=0.3)
-        
-        # Gráfica 3: Duración de episodios
-        ax3.plot(self.episode_lengths, 'purple', alpha=0.7)
-        ax3.set_title('Duración de Episodios')
-        ax3.set_xlabel('Episodio')
-        ax3.set_ylabel('Pasos')
-        ax3.grid(True, alpha=0.3)
-        
-        # Gráfica 4: Progreso máximo por episodio
-        ax4.plot(self.progress_history, 'orange')
-        ax4.set_title('Progreso Máximo por Episodio (%)')
-        ax4.set_xlabel('Episodio')
-        ax4.set_ylabel('Progreso (%)')
-        ax4.grid(True, alpha=0.3)
-        
-        plt.tight_layout()
-        plt.savefig('training_progress.png', dpi=300, bbox_inches='tight')
-        print(f"📊 Gráficas guardadas como 'training_progress.png'")
+        plot_metrics(self.history, filename, dpi=dpi)
+
+async def train_agent(max_episodes=10, endpoints=None, memory_size=2000, memory_path=None, prioritized=False,
+                      learner=False, sync_every=50, protocol='auto', lockstep=False, repeat=1, sim_envs=0,
+                      metrics_path=None, metrics_sample=1, history_path=None, plot_every=0,
+                      checkpoint_dir='checkpoints', checkpoint_every=50, keep_checkpoints=3, resume=None,
+                      target_update='hard', double_dqn=True, record_path=None):
+    """Entrena el agente contra una o varias instancias de Godot (una por endpoint)
 
-async def train_agent(max_episodes=10):
-    agent = TractorAgent()
+    Con `learner=True` el entrenamiento corre en un proceso aparte sobre una
+    memoria compartida y este bucle solo hace inferencia; los pesos nuevos
+    llegan cada `sync_every` actualizaciones del learner. `protocol` elige el
+    formato de los mensajes: 'auto' negocia el binario si Godot lo soporta.
+    Con `lockstep=True` cada acción avanza exactamente `repeat` ticks de física
+    y Godot responde una vez por paso (sin estados viejos en el socket).
+    Con `sim_envs=N` se entrena sin Godot contra N campos del simulador NumPy.
+    `metrics_path` activa la medición de tiempos por etapa (uno de cada
+    `metrics_sample` pasos) y la vuelca periódicamente a ese fichero.
+    El historial de episodios se escribe por bloques en `history_path` (por
+    defecto un directorio nuevo en training_history/) y con `plot_every` se
+    regeneran las gráficas cada tantos episodios.
+    Cada `checkpoint_every` episodios se guarda en segundo plano un checkpoint
+    en `checkpoint_dir` (pesos, optimizador, epsilon, episodio y memoria) y
+    se conservan los `keep_checkpoints` últimos; `resume` acepta uno de ellos
+    o el directorio entero (se toma el más reciente) para continuar.
+    `target_update` ('hard', 'soft' o None) y `double_dqn` configuran el
+    objetivo del replay (ver TractorAgent.train_batch).
+    Con `record_path` todas las transiciones se graban además en shards en
+    ese directorio para reutilizarlas con `dataset.py pretrain`.
+    """
+    snapshot = None
+    if resume:
+        resume = checkpoint.resolve(resume)
+        snapshot = checkpoint.load(resume)
+        history_path = history_path or snapshot['state']['history_path']
+    history_path = history_path or os.path.join('training_history', time.strftime('%Y%m%d_%H%M%S'))
+    endpoints = endpoints or [DEFAULT_URI]
+    background = None
+    if learner:
+        if prioritized or memory_path:
+            raise ValueError("El learner separado usa memoria compartida uniforme: sin PER ni memory_path")
+        agent = TractorAgent(memory=SharedReplayBuffer(memory_size), history_path=history_path,
+                             target_update=target_update, double_dqn=double_dqn)
+    else:
+        agent = TractorAgent(memory_size=memory_size, memory_path=memory_path, prioritized=prioritized,
+                             history_path=history_path, target_update=target_update, double_dqn=double_dqn)
+    if len(agent.memory):
+        print(f"🧠 Memoria recuperada de {memory_path}: {len(agent.memory)} experiencias")
     episode = 0
+    if snapshot is not None:
+        episode = checkpoint.restore(agent, snapshot, restore_memory=not len(agent.memory))
+        # Los episodios registrados después del checkpoint se vuelven a jugar
+        agent.history.truncate(episode)
+        print(f"♻️ Reanudando desde {resume}: episodio {episode}, ε={agent.epsilon:.3f}, "
+              f"{len(agent.memory)} experiencias")
+        snapshot = None
+    if learner:
+        background = Learner(agent.model.get_weights(), agent.memory, sync_every=sync_every,
+                             target_update=agent.target_update, target_sync_every=agent.target_sync_every,
+                             tau=agent.tau, double_dqn=agent.double_dqn)
+        background.start()
+    checkpoints = CheckpointManager(checkpoint_dir, keep=keep_checkpoints)
+    profiler = Profiler(metrics_path, sample_every=metrics_sample) if metrics_path else NULL_PROFILER
+    recorder = TransitionRecorder(record_path) if record_path else None
+    n_envs = sim_envs or len(endpoints)
     
-    # Configuración de conexión
-    ws_config = {
-        'ping_interval': None,
-        'close_timeout': 1,
-        'max_size': 2**20  # 1MB para mensajes grandes
-    }
+    MAX_STEPS_PER_EPISODE = 500
 
     print(f"🚜 Iniciando entrenamiento del agente tractor (máximo {max_episodes} episodios)")
+    if sim_envs:
+        print(f"🌾 Simulador NumPy: {sim_envs} campos en paralelo")
+    else:
+        print(f"🌐 Instancias de Godot: {', '.join(endpoints)}")
+    if prioritized:
+        print("🎯 Repetición priorizada (PER) activada")
+    if lockstep:
+        print(f"🔒 Modo lockstep: {repeat} ticks de física por acción")
+    if background is not None:
+        print(f"🧵 Learner en proceso separado (sincronización cada {sync_every} actualizaciones)")
+    print(f"📚 Historial de episodios en {history_path}")
+    if checkpoint_every:
+        print(f"💾 Checkpoints cada {checkpoint_every} episodios en {checkpoint_dir} (se conservan {keep_checkpoints})")
+    if metrics_path:
+        print(f"⏱️  Tiempos por etapa en {metrics_path} (1 de cada {metrics_sample} pasos)")
+    if recorder is not None:
+        print(f"🎞️  Grabando transiciones en {record_path}")
     print("=" * 60)
 
-    while episode < max_episodes:
-        try:
-            print(f"\n🎮 Episodio {episode + 1}/{max_episodes} | ε={agent.epsilon:.3f}")
-            async with websockets.connect('ws://localhost:8765', **ws_config) as ws:
-                print("✅ Conexión establecida con Godot")
+    completed = False
+    try:
+        while episode < max_episodes:
+            if sim_envs:
+                env = AsyncFieldEnv(sim_envs, repeat=repeat)
+            else:
+                env = VecTractorEnv(endpoints, protocol=protocol, lockstep=lockstep, repeat=repeat, profiler=profiler)
+            try:
+                await env.connect()
+                print(f"✅ Conexión establecida ({n_envs} instancias, protocolo {', '.join(env.protocols)})")
+            
+                # Paso 1: Reiniciar todas las instancias y recibir estados iniciales
+                obs = await env.reset()
+                total_reward = np.zeros(n_envs)
+                max_progress = np.zeros(n_envs)
+                steps = np.zeros(n_envs, dtype=int)
+                episode_start = np.full(n_envs, time.perf_counter())
+                tick = 0
+                print(f"\n🎮 Episodio {episode + 1}/{max_episodes} | ε={agent.epsilon:.3f}")
+
+                while episode < max_episodes:
+                    profiler.tick()
                 
-                # Paso 1: Recibir estado inicial
-                state_data = await ws.recv()
-                state = json.loads(state_data)
-                obs = state['observation']
-                total_reward = 0
-                max_progress = 0
-                steps = 0
+                    # Paso 2: Seleccionar acciones (una predicción para las N instancias)
+                    t = profiler.start()
+                    actions = agent.act_batch(obs)
+                    profiler.stop('act', t)
                 
-                MAX_STEPS_PER_EPISODE = 500
-
-                while not state['done'] and steps < MAX_STEPS_PER_EPISODE:
-                    # Paso 2: Seleccionar acción
-                    acceleration, steering, brake = agent.act(obs)
-                    action = {
-                        "acceleration": float(acceleration),
-                        "steering": float(steering),
-                        "brake": float(brake),
-                        "four_wheel_drive": False,
-                        "reset_episode": False
-                    }
-                    
-                    # Paso 3: Enviar acción
-                    await ws.send(json.dumps(action))
-                    
-                    # Paso 4: Recibir nuevo estado
-                    next_state_data = await ws.recv()
-                    next_state = json.loads(next_state_data)
-                    next_obs = next_state['observation']
-                    
-                    # Paso 5: Almacenar experiencia
-                    reward = next_state['reward']
-                    done = next_state['done']
-                    agent.remember(obs, [acceleration, steering, brake], reward, next_obs, done)
-                    
-                    # Paso 6: Entrenar
-                    if len(agent.memory) > agent.batch_size and steps % agent.train_interval == 0:
+                    # Paso 3-4: Enviar acciones y recibir nuevos estados en paralelo
+                    t = profiler.start()
+                    next_obs, rewards, dones, progress = await env.step(actions)
+                    profiler.stop('step', t)
+                
+                    # Paso 5: Almacenar experiencias en la memoria compartida
+                    t = profiler.start()
+                    agent.memory.add_batch(obs, actions, rewards, next_obs, dones)
+                    if recorder is not None:
+                        recorder.add_batch(obs, actions, rewards, next_obs, dones)
+                    profiler.stop('store', t)
+                
+                    # Paso 6: Entrenar (o recoger los pesos que publique el learner)
+                    t = profiler.start()
+                    if background is not None:
+                        background.sync(agent)
+                        profiler.stop('sync', t)
+                    elif len(agent.memory) > agent.batch_size and tick % agent.train_interval == 0:
                         agent.replay()
-                    
+                        profiler.stop('replay', t)
+                    tick += 1
+                
                     # Actualizar métricas
-                    state = next_state
                     obs = next_obs
-                    total_reward += reward
+                    total_reward += rewards
                     steps += 1
-                    
-                    # Rastrear progreso máximo
-                    if 'info' in state and 'progress' in state['info']:
-                        max_progress = max(max_progress, state['info']['progress'])
-                    
-                    # Mostrar progreso cada 100 pasos
-                    if steps % 100 == 0:
-                        current_progress = state.get('info', {}).get('progress', 0)
-                        print(f"⏩ Paso {steps} | Recompensa: {total_reward:.1f} | Progreso: {current_progress:.1f}%")
+                    max_progress = np.maximum(max_progress, progress)
                 
-                # Fin del episodio - guardar métricas
-                episode += 1
-                agent.episode_rewards.append(total_reward)
-                agent.episode_lengths.append(steps)
-                agent.epsilon_history.append(agent.epsilon)
-                agent.progress_history.append(max_progress)
+                    # Mostrar progreso cada 100 pasos
+                    if steps[0] % 100 == 0:
+                        print(f"⏩ Paso {steps[0]} | Recompensa: {total_reward[0]:.1f} | Progreso: {progress[0]:.1f}%")
                 
-                # Actualizar epsilon
-                agent.epsilon = max(agent.epsilon_min, agent.epsilon * agent.epsilon_decay)
+                    # Fin de episodio en las instancias terminadas o que alcanzan el límite de pasos
+                    finished = np.flatnonzero(dones | (steps >= MAX_STEPS_PER_EPISODE))
+                    for i in finished:
+                        if episode >= max_episodes:
+                            break
+                        episode_time = time.perf_counter() - episode_start[i]
+                        episode += 1
+                        agent.history.append(total_reward[i], steps[i], agent.epsilon, max_progress[i])
+                    
+                        # Actualizar epsilon
+                        agent.epsilon = max(agent.epsilon_min, agent.epsilon * agent.epsilon_decay)
+                    
+                        # Mostrar resumen del episodio
+                        instance = f" (instancia {i})" if n_envs > 1 else ""
+                        print(f"🏁 Episodio {episode} completado{instance}:")
+                        print(f"   └─ Recompensa total: {total_reward[i]:.1f}")
+                        print(f"   └─ Pasos: {steps[i]}")
+                        print(f"   └─ Progreso máximo: {max_progress[i]:.1f}%")
+                        print(f"   └─ Epsilon actual: {agent.epsilon:.3f}")
+                        print(f"   └─ Pasos/seg: {steps[i] / max(episode_time, 1e-9):.1f}")
+                        if background is not None:
+                            print(f"   └─ Actualizaciones del learner: {background.updates.value}")
+                    
+                        # Mostrar estadísticas cada 10 episodios
+                        if episode % 10 == 0:
+                            avg_reward = agent.history.recent_mean('reward', 10)
+                            avg_progress = agent.history.recent_mean('progress', 10)
+                            print(f"\n📊 Estadísticas últimos 10 episodios:")
+                            print(f"   └─ Recompensa promedio: {avg_reward:.1f}")
+                            print(f"   └─ Progreso promedio: {avg_progress:.1f}%")
+                            agent.history.flush()
+                            if recorder is not None:
+                                recorder.flush()
+                    
+                        if plot_every and episode % plot_every == 0:
+                            agent.history.flush()
+                            agent.save_training_plots(dpi=100)
+                    
+                        # El optimizador del learner vive en su proceso: solo se guardan sus pesos
+                        if checkpoint_every and episode % checkpoint_every == 0:
+                            agent.history.flush()
+                            checkpoints.save(agent, episode, include_optimizer=background is None)
+                    
+                        if episode < max_episodes:
+                            print(f"\n🎮 Episodio {episode + 1}/{max_episodes} | ε={agent.epsilon:.3f}")
                 
-                # Mostrar resumen del episodio
-                print(f"🏁 Episodio {episode} completado:")
-                print(f"   └─ Recompensa total: {total_reward:.1f}")
-                print(f"   └─ Pasos: {steps}")
-                print(f"   └─ Progreso máximo: {max_progress:.1f}%")
-                print(f"   └─ Epsilon actual: {agent.epsilon:.3f}")
+                    # Sin learner el actor seguiría jugando con pesos congelados
+                    if background is not None and len(finished) and not background.process.is_alive():
+                        raise RuntimeError(f"El learner ha terminado inesperadamente "
+                                           f"(código {background.process.exitcode})")
                 
-                # Mostrar estadísticas cada 10 episodios
-                if episode % 10 == 0:
-                    avg_reward = np.mean(agent.episode_rewards[-10:])
-                    avg_progress = np.mean(agent.progress_history[-10:])
-                    print(f"\n📊 Estadísticas últimos 10 episodios:")
-                    print(f"   └─ Recompensa promedio: {avg_reward:.1f}")
-                    print(f"   └─ Progreso promedio: {avg_progress:.1f}%")
+                    if len(finished) and episode < max_episodes:
+                        obs[finished] = await env.reset(finished)
+                        total_reward[finished] = 0
+                        max_progress[finished] = 0
+                        steps[finished] = 0
+                        episode_start[finished] = time.perf_counter()
                 
-        except websockets.exceptions.ConnectionClosed as e:
-            print(f"🔌 Conexión cerrada: {e.code} - {e.reason}")
-            print("⌛ Esperando 3 segundos antes de reconectar...")
-            await asyncio.sleep(3)
-            continue
+            except websockets.ConnectionClosed as e:
+                print(f"🔌 Conexión cerrada: {e.code} - {e.reason}")
+                print("⌛ Esperando 3 segundos antes de reconectar...")
+                await asyncio.sleep(3)
+                continue
             
-        except Exception as e:
-            print(f"⚠️ Error en episodio {episode + 1}: {type(e).__name__}: {str(e)}")
-            print("⌛ Esperando 3 segundos antes de continuar...")
-            await asyncio.sleep(3)
-            continue
+            except Exception as e:
+                if background is not None and not background.process.is_alive():
+                    # Reintentar no sirve de nada si el learner ha caído
+                    raise
+                print(f"⚠️ Error en episodio {episode + 1}: {type(e).__name__}: {str(e)}")
+                print("⌛ Esperando 3 segundos antes de continuar...")
+                await asyncio.sleep(3)
+                continue
+
+            finally:
+                await env.close()
+        completed = True
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        # Interrupción manual: guardar el estado antes de salir para poder reanudar
+        if background is not None:
+            background.stop()
+            background.sync(agent)
+        agent.history.flush()
+        agent.memory.flush()
+        if recorder is not None:
+            recorder.flush()
+        if checkpoint_every:
+            print(f"\n💾 Guardando checkpoint del episodio {episode} antes de salir...")
+            checkpoints.save(agent, episode, include_optimizer=background is None, block=True)
+        raise
+    finally:
+        # También al interrumpir o fallar: esos son justo los tiempos que interesa ver
+        profiler.close()
+        if background is not None and not completed:
+            # Interrupción o error: detener el learner y liberar ya la memoria compartida
+            background.stop()
+            background.close()
 
     # Entrenamiento completado
     print("\n" + "=" * 60)
     print("🎉 ENTRENAMIENTO COMPLETADO")
     print("=" * 60)
     
+    # Detener el learner y quedarse con sus últimos pesos
+    if background is not None:
+        background.stop()
+        background.sync(agent)
+        print(f"🧵 Learner detenido tras {background.updates.value} actualizaciones")
+    
     # Guardar modelo final
     model_filename = 'tractor_model_final.h5'
     agent.model.save(model_filename)
     print(f"💾 Modelo final guardado como: {model_filename}")
     
+    # Exportación compacta para test_model sin TensorFlow
+    export_filename = 'tractor_model_final.npz'
+    agent.policy.set_weights(agent.model.get_weights())
+    agent.policy.save_npz(export_filename)
+    print(f"📦 Pesos exportados para inferencia sin Keras: {export_filename}")
+    agent.memory.flush()
+    if recorder is not None:
+        recorder.close()
+        print(f"🎞️  {len(recorder)} transiciones grabadas en {record_path}")
+    
+    # Checkpoint final: permite ampliar el entrenamiento con resume y más episodios
+    agent.history.flush()
+    if checkpoint_every and checkpoints.last_episode != episode:
+        checkpoints.save(agent, episode, include_optimizer=background is None, block=True)
+    # La memoria compartida se libera después del último checkpoint, que la copia
+    if background is not None:
+        background.close()
+    
     # Mostrar estadísticas finales
-    if agent.episode_rewards:
-        best_reward = max(agent.episode_rewards)
-        best_episode = agent.episode_rewards.index(best_reward) + 1
-        avg_reward = np.mean(agent.episode_rewards)
-        final_progress = max(agent.progress_history) if agent.progress_history else 0
+    agent.history.flush()
+    if len(agent.history):
+        rewards_stats = agent.history.stats['reward']
+        best_reward = rewards_stats.max
+        best_episode = rewards_stats.argmax + 1
+        avg_reward = rewards_stats.mean
+        final_progress = agent.history.stats['progress'].max
         
         print(f"\n📈 ESTADÍSTICAS FINALES:")
-        print(f"   ├─ Total de episodios: {len(agent.episode_rewards)}")
+        print(f"   ├─ Total de episodios: {len(agent.history)}")
         print(f"   ├─ Mejor recompensa: {best_reward:.1f} (Episodio {best_episode})")
         print(f"   ├─ Recompensa promedio: {avg_reward:.1f}")
         print(f"   ├─ Mejor progreso: {final_progress:.1f}%")
         print(f"   └─ Epsilon final: {agent.epsilon:.3f}")
     
+    if metrics_path:
+        print(f"\n⏱️  Tiempos por etapa (guardados en {metrics_path}):")
+        for stage, stats in profiler.summary().items():
+            print(f"   ├─ {stage}: media {stats['mean'] * 1e3:.3f} ms | p99 ≤ {stats['p99'] * 1e3:.3f} ms "
+                  f"| {stats['count']} muestras")
+    
     # Generar gráficas
     print("\n📊 Generando gráficas de entrenamiento...")
     agent.save_training_plots()
@@ -278,11 +486,56 @@ async def train_agent(max_episodes=10):
     return agent
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entrenamiento del agente tractor")
+    parser.add_argument("--episodes", type=int, default=50, help="Número máximo de episodios")
+    parser.add_argument("--endpoints", nargs="+", default=None,
+                        help="URIs websocket de las instancias de Godot (por defecto ws://localhost:8765)")
+    parser.add_argument("--ports", type=int, nargs="+", default=None,
+                        help="Atajo para varias instancias locales: lista de puertos")
+    parser.add_argument("--memory-size", type=int, default=2000)
+    parser.add_argument("--memory-path", default=None, help="Directorio para la memoria en disco (memmap)")
+    parser.add_argument("--prioritized", action="store_true", help="Usar repetición priorizada (PER)")
+    parser.add_argument("--learner", action="store_true", help="Entrenar en un proceso separado (actor/learner)")
+    parser.add_argument("--protocol", choices=["auto", "json", "binary"], default="auto",
+                        help="Formato de mensajes con Godot (auto negocia binario si está disponible)")
+    parser.add_argument("--lockstep", action="store_true", help="Avance sincronizado: un estado por acción")
+    parser.add_argument("--repeat", type=int, default=1, help="Ticks de física por acción en modo lockstep")
+    parser.add_argument("--sync-every", type=int, default=50, help="Actualizaciones del learner entre publicaciones de pesos")
+    parser.add_argument("--metrics", default=None,
+                        help="Fichero de tiempos por etapa (.csv, .jsonl o .prom para Prometheus)")
+    parser.add_argument("--metrics-sample", type=int, default=1, help="Medir uno de cada N pasos")
+    parser.add_argument("--history", default=None,
+                        help="Directorio del historial de episodios (por defecto training_history/<fecha>)")
+    parser.add_argument("--plot-every", type=int, default=0, help="Regenerar las gráficas cada N episodios")
+    parser.add_argument("--checkpoint-dir", default="checkpoints")
+    parser.add_argument("--checkpoint-every", type=int, default=50, help="Episodios entre checkpoints (0 = desactivar)")
+    parser.add_argument("--keep-checkpoints", type=int, default=3, help="Checkpoints que se conservan")
+    parser.add_argument("--resume", default=None, help="Checkpoint (o directorio de checkpoints) desde el que reanudar")
+    parser.add_argument("--target", choices=["hard", "soft", "none"], default="hard",
+                        help="Sincronización de la red objetivo (none = bootstrap con la red online)")
+    parser.add_argument("--no-double", action="store_true", help="Objetivo DQN clásico en lugar de Double DQN")
+    parser.add_argument("--record", default=None, metavar="DIR",
+                        help="Grabar todas las transiciones en shards para entrenamiento offline")
+    parser.add_argument("--sim", type=int, default=0, metavar="N",
+                        help="Entrenar sin Godot contra N campos del simulador NumPy")
+    args = parser.parse_args()
+
+    endpoints = args.endpoints or (endpoints_for_ports(args.ports) if args.ports else None)
+
     try:
-        # Cambiar max_episodes según necesites
-        agent = asyncio.run(train_agent(max_episodes=50))
+        agent = asyncio.run(train_agent(max_episodes=args.episodes, endpoints=endpoints,
+                                        memory_size=args.memory_size, memory_path=args.memory_path,
+                                        prioritized=args.prioritized, learner=args.learner,
+                                        sync_every=args.sync_every, protocol=args.protocol,
+                                        lockstep=args.lockstep, repeat=args.repeat, sim_envs=args.sim,
+                                        metrics_path=args.metrics, metrics_sample=args.metrics_sample,
+                                        history_path=args.history, plot_every=args.plot_every,
+                                        checkpoint_dir=args.checkpoint_dir, checkpoint_every=args.checkpoint_every,
+                                        keep_checkpoints=args.keep_checkpoints, resume=args.resume,
+                                        target_update=None if args.target == "none" else args.target,
+                                        double_dqn=not args.no_double, record_path=args.record))
     except KeyboardInterrupt:
         print("\n🛑 Entrenamiento detenido manualmente")
-        print("💾 Los datos recopilados hasta ahora se mantendrán...")
+        print(f"💾 Para continuar: python train_tractor.py --resume {args.checkpoint_dir}")
     except Exception as e:
         print(f"\n❌ Error crítico en el entrenamiento: {type(e).__name__}: {str(e)}")
\ No newline at end of file
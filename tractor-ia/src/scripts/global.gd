@@ -4,3 +4,19 @@ var tractor_position: Vector3 = Vector3.ZERO
 
 var surcador_position: Vector3 = Vector3.ZERO
 var surcador_collision: bool = false
+
+# Modo rápido para entrenamiento sin pantalla (ver ia/launcher.py):
+# godot --headless -- --fast --time-scale=4 --physics-fps=120
+var modo_rapido: bool = false
+
+func _ready():
+	for arg in OS.get_cmdline_user_args():
+		if arg == "--fast":
+			modo_rapido = true
+		elif arg.begins_with("--time-scale="):
+			Engine.time_scale = float(arg.get_slice("=", 1))
+		elif arg.begins_with("--physics-fps="):
+			Engine.physics_ticks_per_second = int(arg.get_slice("=", 1))
+	
+	# Con time_scale alto hacen falta más ticks de física por frame para no perder simulación
+	Engine.max_physics_steps_per_frame = max(8, int(ceil(8 * Engine.time_scale)))
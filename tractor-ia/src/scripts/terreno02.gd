@@ -10,6 +10,10 @@ var obstaculos = []
 var vallas = []  # Para el perímetro
 var decoraciones = []  # Para elementos decorativos
 
+# Contadores incrementales para no recorrer la matriz en cada consulta de progreso
+var total_tierra := 0
+var tierra_arada := 0
+
 var textura_tierra_sin_arar = preload("res://src/assets/img/grassB.bmp.png")
 var textura_tierra_arada = preload("res://src/assets/img/arada.png")
 
@@ -30,15 +34,23 @@ func _ready() -> void:
 	# material_base.metallic = 0.0
 	# mesh_node.set_surface_override_material(0, material_base)
 	
-	var plane_mesh = PlaneMesh.new()
+	construir_campo()
+
+# En modo rápido (Global.modo_rapido) solo se crea lo que afecta a la física:
+# ni celdas visuales, ni vallas, ni decoraciones, y los árboles quedan en su colisión
+func construir_campo():
 	generar_campo()
-	crear_celdas_visuales(plane_mesh)
+	if not Global.modo_rapido:
+		crear_celdas_visuales(PlaneMesh.new())
 	crear_obstaculos_3d()
-	crear_valla_perimetral()
-	agregar_decoraciones()
+	if not Global.modo_rapido:
+		crear_valla_perimetral()
+		agregar_decoraciones()
 
 func generar_campo():
 	matriz.clear()
+	total_tierra = 0
+	tierra_arada = 0
 	for i in range(filas):
 		var fila := []
 		for j in range(columnas):
@@ -46,6 +58,7 @@ func generar_campo():
 				fila.append(TipoTerreno.OBSTACULO)
 			else:
 				fila.append(TipoTerreno.TIERRA_SIN_ARAR)
+				total_tierra += 1
 		matriz.append(fila)
 
 func crear_celdas_visuales(plane_mesh: PlaneMesh):
@@ -245,14 +258,14 @@ func crear_obstaculos_3d():
 		for j in range(columnas):
 			if matriz[i][j] == TipoTerreno.OBSTACULO:
 				var obstaculo_body = StaticBody3D.new()
-				var mesh_instance = crear_arbol_mejorado()
 				var collision_shape = crear_colision_tronco()
 				
 				var x = (j - columnas / 2.0) * spacing
 				var z = (i - filas / 2.0) * spacing
 				obstaculo_body.position = Vector3(x, 0, z)
 
-				obstaculo_body.add_child(mesh_instance)
+				if not Global.modo_rapido:
+					obstaculo_body.add_child(crear_arbol_mejorado())
 				obstaculo_body.add_child(collision_shape)
 
 				add_child(obstaculo_body)
@@ -449,6 +462,9 @@ func _process(delta: float) -> void:
 	if i >= 0 and i < filas and j >= 0 and j < columnas:
 		if matriz[i][j] == TipoTerreno.TIERRA_SIN_ARAR:
 			matriz[i][j] = TipoTerreno.TIERRA_ARADA
+			tierra_arada += 1
+			if celdas.is_empty():
+				return
 			var target_mesh = celdas[i][j]
 			var material = StandardMaterial3D.new()
 			actualizar_material_celda(material, TipoTerreno.TIERRA_ARADA)
@@ -468,13 +484,9 @@ func regenerar_campo():
 	
 	decoraciones.clear()
 	vallas.clear()
+	celdas.clear()
 	
-	generar_campo()
-	var plane_mesh = PlaneMesh.new()
-	crear_celdas_visuales(plane_mesh)
-	crear_obstaculos_3d()
-	crear_valla_perimetral()
-	agregar_decoraciones()
+	construir_campo()
 
 func obtener_tipo_terreno(pos_mundial: Vector3) -> TipoTerreno:
 	var j = int((pos_mundial.x / spacing) + columnas / 2.0)
@@ -486,14 +498,4 @@ func obtener_tipo_terreno(pos_mundial: Vector3) -> TipoTerreno:
 		return TipoTerreno.OBSTACULO
 
 func obtener_progreso_arado() -> float:
-	var total_tierra = 0
-	var tierra_arada = 0
-	
-	for i in range(filas):
-		for j in range(columnas):
-			if matriz[i][j] != TipoTerreno.OBSTACULO:
-				total_tierra += 1
-				if matriz[i][j] == TipoTerreno.TIERRA_ARADA:
-					tierra_arada += 1
-	
 	return float(tierra_arada) / float(total_tierra) * 100.0 if total_tierra > 0 else 0.0
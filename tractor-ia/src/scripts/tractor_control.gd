@@ -15,6 +15,15 @@ var surcador_activo := false  # Siempre activo y bajado
 var tcp_server := TCPServer.new()
 var connected_client: WebSocketPeer = null
 var port := 8765
+# Protocolo binario negociado (ver ia/protocol.py); JSON por defecto para clientes antiguos
+var binary_protocol := false
+
+# Modo lockstep: la simulación queda en pausa hasta recibir una acción con step_id,
+# avanza exactamente `repeat` ticks de física y responde una sola vez
+var lockstep := false
+var pending_ticks := 0
+var awaiting_reply := false
+var current_step_id := 0
 
 # Variables RL
 var last_progress := 0.0
@@ -28,14 +37,23 @@ var actions := {
 }  # Eliminado "activate_plow"
 
 func _ready():
+	leer_argumentos()
 	tcp_server.listen(port, "127.0.0.1")
 	print("🚀 Servidor WebSocket en ws://localhost:", port)
 	configurar_tractor()
 	reset_episode()
 	# Bajamos el surcador inmediatamente al inicio
 
+# Argumentos tras "--": godot --headless -- --port=8766
+# Permite lanzar varias instancias en paralelo, cada una en su puerto
+func leer_argumentos():
+	for arg in OS.get_cmdline_user_args():
+		if arg.begins_with("--port="):
+			port = int(arg.get_slice("=", 1))
+
 func _process(_delta):
-	step_count += 1
+	if not lockstep:
+		step_count += 1
 	handle_websocket()
 func handle_websocket():
 	# Nueva conexión
@@ -49,9 +67,11 @@ func handle_websocket():
 		var err = ws_peer.accept_stream(conn)
 		if err == OK:
 			connected_client = ws_peer
+			binary_protocol = false
+			salir_de_lockstep()
 			print("🤝 Cliente conectado | Protocolo: ", ws_peer.get_selected_protocol())
-			# Enviar confirmación (modo texto implícito)
-			connected_client.send_text(JSON.stringify({"handshake": "ok"}))
+			# Enviar confirmación (modo texto implícito) anunciando los protocolos disponibles
+			connected_client.send_text(JSON.stringify({"handshake": "ok", "protocols": ["json", "binary"], "lockstep": true}))
 		else:
 			push_error("❌ Error aceptando conexión: ", err)
 	
@@ -65,36 +85,125 @@ func handle_websocket():
 			while connected_client.get_available_packet_count() > 0:
 				var pkt = connected_client.get_packet()
 				if pkt.size() > 0:
-					# Godot 4 ya maneja automáticamente el modo texto/binario
+					if not connected_client.was_string_packet():
+						recibir_accion_binaria(pkt)
+						continue
 					var data = JSON.parse_string(pkt.get_string_from_utf8())
-					if data:
-						actions = data
-						if actions.get("reset_episode", false): 
-							reset_episode()
+					if data and data.has("protocol"):
+						negociar_protocolo(data)
+					elif data:
+						aplicar_accion(data)
 			
-			# Envío (sin especificar modo)
-			send_state()
+			# Envío (sin especificar modo); en lockstep solo se responde al terminar cada paso
+			if not lockstep:
+				send_state()
 			
 		elif state == WebSocketPeer.STATE_CLOSED:
 			var code = connected_client.get_close_code()
 			var reason = connected_client.get_close_reason()
 			print("🚪 Conexión cerrada: ", code, " - ", reason)
 			connected_client = null
+			salir_de_lockstep()
+
+func negociar_protocolo(data: Dictionary):
+	binary_protocol = data["protocol"] == "binary"
+	if data.get("lockstep", false):
+		entrar_en_lockstep()
+	connected_client.send_text(JSON.stringify({
+		"protocol": "binary" if binary_protocol else "json", "lockstep": lockstep
+	}))
+
+# Acción binaria: 7 float32 little-endian
+# [acceleration, steering, brake, four_wheel_drive, reset_episode, step_id, repeat]
+func recibir_accion_binaria(pkt: PackedByteArray):
+	if pkt.size() < 28:
+		return
+	aplicar_accion({
+		"acceleration": pkt.decode_float(0),
+		"steering": pkt.decode_float(4),
+		"brake": pkt.decode_float(8) > 0.0,
+		"four_wheel_drive": pkt.decode_float(12) > 0.5,
+		"reset_episode": pkt.decode_float(16) > 0.5,
+		"step_id": int(pkt.decode_float(20)),
+		"repeat": int(pkt.decode_float(24))
+	})
+
+func aplicar_accion(data: Dictionary):
+	actions = data
+	if actions.get("reset_episode", false):
+		reset_episode()
+	if lockstep:
+		current_step_id = int(actions.get("step_id", 0))
+		pending_ticks = max(1, int(actions.get("repeat", 1)))
+		awaiting_reply = false
+		get_tree().paused = false
+
+func entrar_en_lockstep():
+	lockstep = true
+	# El tractor sigue atendiendo el websocket con el árbol en pausa
+	process_mode = Node.PROCESS_MODE_ALWAYS
+	get_tree().paused = true
+
+func salir_de_lockstep():
+	if not lockstep:
+		return
+	lockstep = false
+	awaiting_reply = false
+	pending_ticks = 0
+	process_mode = Node.PROCESS_MODE_INHERIT
+	get_tree().paused = false
+
+# Cuenta los ticks de física del paso en curso; la respuesta se envía al inicio
+# del tick siguiente, cuando la física del último ya se ha integrado
+func avanzar_lockstep() -> bool:
+	if get_tree().paused:
+		return false
+	if awaiting_reply:
+		awaiting_reply = false
+		send_state()
+		get_tree().paused = true
+		return false
+	step_count += 1
+	pending_ticks -= 1
+	if pending_ticks <= 0:
+		awaiting_reply = true
+	return true
 
 func send_state():
 	var progress = get_progress()
 	var reward = calculate_reward(progress)
 	var done = step_count > max_steps or progress >= 99.9
 	
+	var plow = get_plow_state()
+	
+	if binary_protocol:
+		var frame := PackedFloat32Array(get_observation())
+		frame.append_array([reward, 1.0 if done else 0.0, progress, current_step_id])
+		frame.append_array(plow)
+		connected_client.send(frame.to_byte_array(), WebSocketPeer.WRITE_MODE_BINARY)
+		return
+	
 	var state = {
 		"observation": get_observation(),
 		"reward": reward,
 		"done": done,
-		"info": {"progress": progress, "steps": step_count}
+		"info": {"progress": progress, "steps": step_count, "step_id": current_step_id}
 	}
+	if not plow.is_empty():
+		state["info"]["position"] = [plow[0], plow[1]]
+		state["info"]["plowing"] = plow[2] > 0.5
 	
 	connected_client.send_text(JSON.stringify(state))
 
+# Posición del surcador [x, z, arando] para el mapa de cobertura de Python (coverage.py);
+# vacío si no hay Global, y el cliente sigue recibiendo solo el estado básico
+func get_plow_state() -> Array:
+	if not has_node("/root/Global"):
+		return []
+	var global_node = get_node("/root/Global")
+	var pos: Vector3 = global_node.surcador_position
+	return [pos.x, pos.z, 1.0 if global_node.surcador_collision else 0.0]
+
 func get_observation() -> Array:
 	var obs = []
 	
@@ -172,6 +281,9 @@ func reset_episode():
 		terreno.regenerar_campo()
 
 func _physics_process(_delta):
+	if lockstep and not avanzar_lockstep():
+		return
+	
 	# Combinar acciones del WebSocket con input manual
 	var manual_steering = Input.get_axis("ui_right", "ui_left")
 	var manual_acceleration = Input.get_axis("ui_down", "ui_up")